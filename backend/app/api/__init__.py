@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from .chat import router as api_router
+from .system import router as system_router
 
 router = APIRouter()
-router.include_router(api_router, prefix="/chat", tags=["chat"]) 
\ No newline at end of file
+router.include_router(api_router, prefix="/chat", tags=["chat"]) 
+router.include_router(system_router, prefix="/system", tags=["system"])
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.core.ai.service import get_answer_from_llm, get_answer_streaming
+from app.database.chat_history_service import aget_chat_history_page
+from .sse import sse_frames, encode_sse
 import logging
-import json
-from typing import AsyncGenerator
+import base64
+import binascii
+import uuid
+from datetime import datetime
+from typing import AsyncGenerator, List, Optional, Tuple
 
 router = APIRouter()
 
@@ -18,6 +23,28 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
 
+class ChatHistoryItem(BaseModel):
+    id: str
+    question: str
+    answer: str
+    created_at: datetime
+
+class ChatHistoryPage(BaseModel):
+    items: List[ChatHistoryItem]
+    next_cursor: Optional[str] = None
+
+def encode_history_cursor(created_at: datetime, message_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), str(uuid.UUID(message_id))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -41,18 +68,17 @@ async def chat(request: ChatRequest):
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
-async def event_stream(question: str, thread_id: str) -> AsyncGenerator[str, None]:
+async def event_stream(question: str, thread_id: str) -> AsyncGenerator[bytes, None]:
     """
-    Generator function to stream events.
+    Generator function to stream events as pre-encoded SSE frames, coalescing tokens.
     """
     try:
-        async for chunk in get_answer_streaming(question, thread_id):
-            if chunk:
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
+        async for frame in sse_frames(get_answer_streaming(question, thread_id)):
+            yield frame
         
     except Exception as e:
         logger.error(f"Error in event stream: {e}")
-        yield json.dumps({"error": "Internal Server Error"})
+        yield encode_sse({"error": "Internal Server Error"})
 
 @router.post("/chat/stream")
 async def chat_stream(request: ChatRequest) -> StreamingResponse:
@@ -70,4 +96,28 @@ async def chat_stream(request: ChatRequest) -> StreamingResponse:
         )
     except Exception as e:
         logger.error(f"Error in chat stream endpoint: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/history/{thread_id}", response_model=ChatHistoryPage)
+async def chat_history(
+    thread_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """
+    Endpoint to load past messages of a thread, newest first, with keyset (cursor) pagination.
+    Pass the returned next_cursor to load the previous page.
+    """
+    before = decode_history_cursor(cursor) if cursor else None
+
+    try:
+        rows, has_more = await aget_chat_history_page(thread_id, limit=limit, before=before)
+    except Exception as e:
+        logger.error(f"Error in chat history endpoint: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_history_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    return ChatHistoryPage(items=rows, next_cursor=next_cursor)
@@ -0,0 +1,117 @@
+import os
+import json
+import asyncio
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, AsyncIterator, Dict, List
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, dùng json chuẩn nếu chưa cài
+    orjson = None
+
+load_dotenv(find_dotenv())
+
+# Gom token trong tối đa SSE_COALESCE_MS mili giây hoặc SSE_COALESCE_MAX_BYTES byte mỗi frame;
+# SSE_COALESCE_MS=0 gửi mỗi token một frame
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "30"))
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "512"))
+
+def encode_sse(payload: Dict[str, Any]) -> bytes:
+    """
+    Encode một frame SSE "data: <json>\\n\\n" thành bytes.
+    """
+    if orjson is not None:
+        return b"data: " + orjson.dumps(payload) + b"\n\n"
+    return b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    interval_ms: float = SSE_COALESCE_MS,
+    max_bytes: int = SSE_COALESCE_MAX_BYTES,
+) -> AsyncIterator[str]:
+    """
+    Gom các token liên tiếp thành chunk lớn hơn. Token đầu tiên được gửi ngay
+    để không làm chậm time-to-first-token; sau đó buffer được gửi khi đủ max_bytes
+    hoặc khi token cũ nhất trong buffer đã chờ interval_ms.
+    """
+    if interval_ms <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    loop = asyncio.get_running_loop()
+    interval = interval_ms / 1000
+
+    # Trạng thái dùng chung giữa producer và consumer (cùng event loop nên không cần khóa).
+    # Mỗi token chỉ tốn một append; future/timer chỉ được tạo một lần cho mỗi frame.
+    state: Dict[str, Any] = {
+        "buffer": [], "size": 0, "first": True, "done": False, "error": None,
+        "flush": False, "wake": None, "timer": None,
+    }
+
+    def wake_consumer() -> None:
+        state["flush"] = True
+        state["timer"] = None
+        wake = state["wake"]
+        if wake is not None and not wake.done():
+            wake.set_result(None)
+
+    async def produce() -> None:
+        # Generator nguồn chạy trọn trong một task riêng nên giữ nguyên context của nó
+        try:
+            async for token in tokens:
+                state["buffer"].append(token)
+                state["size"] += len(token.encode("utf-8"))
+                if state["first"] or state["size"] >= max_bytes:
+                    state["first"] = False
+                    wake_consumer()
+                elif state["timer"] is None and not state["flush"]:
+                    state["timer"] = loop.call_later(interval, wake_consumer)
+        except Exception as e:
+            state["error"] = e
+        finally:
+            state["done"] = True
+            wake_consumer()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            if not state["flush"]:
+                state["wake"] = loop.create_future()
+                await state["wake"]
+                state["wake"] = None
+            state["flush"] = False
+
+            if state["timer"] is not None:
+                state["timer"].cancel()
+                state["timer"] = None
+            if state["buffer"]:
+                chunk = "".join(state["buffer"])
+                state["buffer"] = []
+                state["size"] = 0
+                yield chunk
+
+            if state["done"] and not state["buffer"]:
+                break
+
+        if state["error"] is not None:
+            raise state["error"]
+    finally:
+        if state["timer"] is not None:
+            state["timer"].cancel()
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def sse_frames(
+    tokens: AsyncIterator[str],
+    interval_ms: float = SSE_COALESCE_MS,
+    max_bytes: int = SSE_COALESCE_MAX_BYTES,
+) -> AsyncIterator[bytes]:
+    async for chunk in coalesce_tokens(tokens, interval_ms, max_bytes):
+        if chunk:
+            yield encode_sse({"content": chunk})
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics() -> Response:
+    """
+    Endpoint to scrape per-stage latency histograms in Prometheus text format.
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
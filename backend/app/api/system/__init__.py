@@ -0,0 +1 @@
+from .routes import router
\ No newline at end of file
@@ -0,0 +1,108 @@
+import os
+import secrets
+from dotenv import load_dotenv, find_dotenv
+from fastapi import APIRouter, Header, HTTPException
+from app.database.pool import get_pool_stats
+from app.database.history_writer import history_writer
+from app.database.history_cache import history_cache
+from app.database.catalog_engine import catalog_engine
+from app.database.product_search_cache import product_search_cache
+from app.core.ai.service import reload_agent
+from app.core.ai.web_search import web_search
+from app.core.ai.answer_cache import answer_cache
+from app.core.ai.request_prep import request_prep_stats
+from app.core.ai.intent_router import intent_router
+from app.core.ai.prompt_cache import prompt_cache_stats
+from typing import Dict, Any, Optional
+
+load_dotenv(find_dotenv())
+
+# Token cho các thao tác quản trị (header X-Admin-Token); không đặt thì các endpoint này bị tắt
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter()
+
+def require_admin_token(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@router.get("/stats/pool")
+async def pool_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get connection pool wait-time and checkout statistics.
+    """
+    return get_pool_stats()
+
+@router.get("/stats/history-writer")
+async def history_writer_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get write-behind chat history queue and flush statistics.
+    """
+    return history_writer.stats()
+
+@router.post("/reload-prompts")
+async def reload_prompts(x_admin_token: Optional[str] = Header(default=None)) -> Dict[str, Any]:
+    """
+    Endpoint to hot-reload the prompts and rebuild the cached agent.
+    Requires the X-Admin-Token header to match ADMIN_TOKEN; disabled when ADMIN_TOKEN is not set.
+    """
+    require_admin_token(x_admin_token)
+    return reload_agent()
+
+@router.get("/stats/history-cache")
+async def history_cache_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get chat history cache hit/miss/eviction counters.
+    """
+    return history_cache.stats()
+
+@router.get("/stats/catalog-engine")
+async def catalog_engine_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get in-memory catalog engine status and catalog version.
+    """
+    return catalog_engine.stats()
+
+@router.get("/stats/product-search-cache")
+async def product_search_cache_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get product search result cache hit ratio and saved latency.
+    """
+    return product_search_cache.stats()
+
+@router.get("/stats/web-search-cache")
+async def web_search_cache_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get web search cache hits, coalesced calls and upstream calls.
+    """
+    return await web_search.astats()
+
+@router.get("/stats/answer-cache")
+async def answer_cache_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get answer cache hits and the number of LLM calls avoided.
+    """
+    return answer_cache.stats()
+
+@router.get("/stats/request-prep")
+async def request_prep_timings() -> Dict[str, Any]:
+    """
+    Endpoint to get per-stage timings of request preparation before the first LLM call.
+    """
+    return request_prep_stats.stats()
+
+@router.get("/stats/intent-router")
+async def intent_router_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get fast-path routing decisions, fallback reasons and estimated latency saved.
+    """
+    return intent_router.stats()
+
+@router.get("/stats/prompt-cache")
+async def prompt_cache_hit_stats() -> Dict[str, Any]:
+    """
+    Endpoint to get provider prompt-cache hits (cached_tokens) and TTFT with and without a cache hit.
+    """
+    return prompt_cache_stats.stats()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.database.catalog_version import aget_catalog_version
+from app.database.search_text import normalize_search_text
+
+load_dotenv(find_dotenv())
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Khoảng thời gian tối đa dùng lại phiên bản catalog đã đọc trước khi hỏi lại database
+ANSWER_CACHE_VERSION_TTL = float(os.getenv("ANSWER_CACHE_VERSION_TTL", "5"))
+
+# Tool có kết quả thay đổi theo thời gian: câu trả lời dùng tool này không được cache
+UNCACHEABLE_TOOLS = {"search_web"}
+
+# Từ tham chiếu tới lượt chat trước ("nó", "máy đó", "như vậy"...): câu hỏi có các từ này
+# phụ thuộc ngữ cảnh nên không được trả lời từ cache
+_CONTEXT_WORDS_RE = re.compile(
+    r"(?<!\w)(nó|này|đó|đấy|kia|ở trên|vừa rồi|như vậy|thế còn|còn thì|cái đó|"
+    r"it|this|that|those|these|them|above|previous)(?!\w)",
+    re.IGNORECASE,
+)
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Khóa cache của câu hỏi: bỏ dấu, chữ thường, bỏ dấu câu, gộp khoảng trắng.
+    """
+    return normalize_search_text(_PUNCTUATION_RE.sub(" ", question)).strip()
+
+
+def is_self_contained(question: str) -> bool:
+    return _CONTEXT_WORDS_RE.search(question) is None
+
+
+def split_answer_chunks(answer: str) -> Iterator[str]:
+    """
+    Chia câu trả lời đã cache thành các chunk theo từ để stream qua SSE như câu trả lời của model.
+    """
+    return (match.group(0) for match in _CHUNK_RE.finditer(answer))
+
+
+class _Entry:
+    __slots__ = ("answer", "version", "expires_at")
+
+    def __init__(self, answer: str, version: int, expires_at: float):
+        self.answer = answer
+        self.version = version
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    Cache LRU câu trả lời cho các câu hỏi lặp lại (chính sách đổi trả, trả góp, địa chỉ cửa hàng...).
+
+    Chỉ lưu và chỉ trả lời từ cache ở lượt chat đầu tiên (không có lịch sử) nên câu trả lời chỉ
+    phụ thuộc vào câu hỏi: câu hỏi tiếp nối ("giá bao nhiêu?") luôn đi qua agent cùng ngữ cảnh.
+    Mỗi entry gắn phiên bản catalog, model và phiên bản prompt; hết hạn sau TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = ANSWER_CACHE_TTL,
+        version_ttl: float = ANSWER_CACHE_VERSION_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    async def _acatalog_version(self) -> int:
+        if self._version is None or time.monotonic() - self._version_checked_at >= self.version_ttl:
+            self._version = await aget_catalog_version()
+            self._version_checked_at = time.monotonic()
+        return self._version
+
+    async def aget(self, question: str, scope: str, has_history: bool) -> Optional[str]:
+        """
+        Trả về câu trả lời đã cache, hoặc None nếu câu hỏi không dùng được cache hoặc miss.
+        scope phân biệt model và phiên bản prompt.
+        """
+        if not self.enabled:
+            return None
+        if has_history or not is_self_contained(question):
+            self.skipped += 1
+            return None
+
+        key = (scope, normalize_question(question))
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at < time.monotonic() or entry.version != await self._acatalog_version():
+            self._entries.pop(key, None)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.answer
+
+    async def aput(self, question: str, scope: str, answer: str, has_history: bool, tools_used=()) -> bool:
+        """
+        Lưu câu trả lời nếu nó chỉ phụ thuộc vào câu hỏi và dữ liệu catalog hiện tại.
+        """
+        if not self.enabled or not answer.strip():
+            return False
+        if has_history or not is_self_contained(question) or UNCACHEABLE_TOOLS.intersection(tools_used):
+            return False
+
+        key = (scope, normalize_question(question))
+        self._entries.pop(key, None)
+        self._entries[key] = _Entry(answer, await self._acatalog_version(), time.monotonic() + self.ttl)
+        self.stores += 1
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "catalog_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "llm_calls_avoided": self.hits,
+            "stores": self.stores,
+            "skipped_context_dependent": self.skipped,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+answer_cache = AnswerCache()
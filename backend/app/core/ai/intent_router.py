@@ -0,0 +1,286 @@
+import os
+import re
+import time
+import logging
+import unicodedata
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from app.database.product_service import aget_flexible_product_search
+from app.database.catalog_version import aget_catalog_version
+from app.database.pool import get_pool
+from app.database.search_text import normalize_search_text
+from .answer_cache import is_self_contained
+
+load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Số sản phẩm tối đa để coi kết quả là đủ cụ thể; nhiều hơn thì để agent hỏi lại/tư vấn
+INTENT_ROUTER_MAX_ROWS = int(os.getenv("INTENT_ROUTER_MAX_ROWS", "5"))
+INTENT_ROUTER_MAX_TERMS = int(os.getenv("INTENT_ROUTER_MAX_TERMS", "6"))
+# Khoảng thời gian tối đa dùng lại bộ từ của tên sản phẩm trước khi kiểm tra lại phiên bản catalog
+INTENT_ROUTER_VOCABULARY_TTL = float(os.getenv("INTENT_ROUTER_VOCABULARY_TTL", "5"))
+
+# "giá" được so khớp trên câu hỏi còn dấu: sau khi bỏ dấu "gia" trùng với "gia đình", "già".
+_PRICE_WORD_RE = re.compile(r"(?<!\w)giá(?!\w)")
+# Các mẫu còn lại được so khớp trên câu hỏi đã bỏ dấu và lower (normalize_search_text).
+# "bao nhiêu" đứng một mình chỉ tính là hỏi giá khi ở cuối câu ("iPhone 15 bao nhiêu"),
+# còn "nặng bao nhiêu gram", "bao nhiêu GB" thì không.
+INTENT_PATTERNS: Dict[str, "re.Pattern"] = {
+    "price": re.compile(r"\bbao nhieu tien\b|\bbao nhieu\s*$"),
+    "address": re.compile(r"\b(dia chi|o dau|cua hang nao|chi nhanh nao|cho nao)\b"),
+}
+
+# Câu hỏi cần so sánh, tư vấn, lọc theo khoảng giá hoặc thông tin ngoài catalog: luôn qua agent.
+# Catalog không có cột tồn kho nên câu hỏi còn/hết hàng cũng để agent trả lời.
+_COMPLEX_RE = re.compile(
+    r"\b(so sanh|nen|tot|hon|khac|danh gia|review|tra gop|khuyen mai|uu dai|giam|bao hanh|doi tra|"
+    r"chinh sach|tin tuc|ra mat|moi nhat|cau hinh|thong so|pin|camera|chip|man hinh|re|dat|duoi|tren|"
+    r"khoang|tam|trieu|tu van|goi y|va|voi|hay|hoac|nhung|"
+    r"nang|gram|kg|trong luong|kich thuoc|inch|mah|"
+    r"con hang|het hang|co hang|con ban|co ban|ton kho)\b"
+)
+
+# Từ nối và từ chỉ ý định, bỏ đi để lấy phần tên sản phẩm
+_FILLER_WORDS = {
+    "gia", "bao", "nhieu", "tien", "la", "cua", "cho", "minh", "toi", "em", "anh", "chi", "ad",
+    "admin", "shop", "oi", "a", "ah", "vay", "the", "nao", "hien", "tai", "bay", "gio", "dien",
+    "thoai", "dt", "may", "con", "hang", "het", "co", "ban", "khong", "ko", "k", "dia", "mua", "o",
+    "dau", "nhanh", "duoc", "can", "biet", "muon", "xem", "hoi", "xin", "vui", "long", "giup",
+    "nhe", "nha", "san", "pham", "chiec", "cai", "dang", "bn", "mau",
+}
+# Màu được nhận diện trên từ còn dấu ("đỏ" chứ không phải "do", "tím" chứ không phải "tìm");
+# từ bổ nghĩa chỉ tính là màu khi đứng sau một từ chỉ màu ("xanh dương", "titan tự nhiên")
+_COLOR_WORDS = {"đen", "trắng", "xanh", "đỏ", "vàng", "tím", "hồng", "bạc", "xám", "titan", "cam", "nâu", "kem"}
+_COLOR_MODIFIERS = {"dương", "lá", "ngọc", "nhạt", "đậm", "tự", "nhiên"}
+_CAPACITY_RE = re.compile(r"\b(\d+)\s*(gb|tb)\b")
+_TOKEN_RE = re.compile(r"[^\w\s]")
+
+ROUTED_COLUMNS = ["name", "capacity", "color", "price", "original_price", "address"]
+
+
+def _words(text: str) -> List[str]:
+    return normalize_search_text(_TOKEN_RE.sub(" ", text)).split()
+
+
+def name_vocabulary(names: Iterable[str]) -> Set[str]:
+    """
+    Tập các từ (đã bỏ dấu) xuất hiện trong tên sản phẩm của catalog.
+    """
+    return {word for name in names if name for word in _words(name)}
+
+
+def detect_intent(
+    question: str,
+    vocabulary: Optional[Set[str]] = None,
+) -> Tuple[Optional[str], Dict[str, List[str]], str]:
+    """
+    Nhận diện câu hỏi tra cứu đơn giản (giá, địa chỉ) của một sản phẩm.
+
+    Trả về (intent, bộ lọc name/capacity/color cho flexible_product_search, lý do); intent là None
+    khi câu hỏi không đủ chắc chắn để trả lời mà không qua agent. Nếu có vocabulary (các từ của
+    tên sản phẩm trong catalog), câu hỏi còn từ không thuộc tên sản phẩm nào ("thu cũ",
+    "khi nào ra") cũng quay về agent thay vì bị tìm như một phần của tên.
+    """
+    if not is_self_contained(question):
+        return None, {}, "context_dependent"
+
+    lowered = unicodedata.normalize("NFC", _TOKEN_RE.sub(" ", question).lower())
+    text = normalize_search_text(lowered)
+    intents = [name for name, pattern in INTENT_PATTERNS.items() if pattern.search(text)]
+    if _PRICE_WORD_RE.search(lowered) and "price" not in intents:
+        intents.append("price")
+    if not intents:
+        return None, {}, "no_intent"
+    if len(intents) > 1:
+        return None, {}, "multiple_intents"
+    if _COMPLEX_RE.search(text):
+        return None, {}, "complex_question"
+
+    # Dung lượng ("256GB", "1 TB") lọc theo cột capacity, không theo tên
+    capacity = [f"{number}{unit}" for number, unit in _CAPACITY_RE.findall(text)]
+    lowered = _CAPACITY_RE.sub(" ", lowered)
+
+    color: List[str] = []
+    terms: List[str] = []
+    previous_is_color = False
+    for word in lowered.split():
+        if word in _COLOR_WORDS or (previous_is_color and word in _COLOR_MODIFIERS):
+            folded = normalize_search_text(word)
+            if previous_is_color:
+                color[-1] = f"{color[-1]} {folded}"
+            else:
+                color.append(folded)
+            previous_is_color = True
+            continue
+        previous_is_color = False
+        folded = normalize_search_text(word)
+        if folded not in _FILLER_WORDS:
+            terms.append(folded)
+
+    if not terms:
+        return None, {}, "no_product"
+    if len(terms) > INTENT_ROUTER_MAX_TERMS:
+        return None, {}, "too_many_terms"
+    if vocabulary is not None and any(term not in vocabulary for term in terms):
+        return None, {}, "unknown_terms"
+
+    filters = {"name": terms}
+    if capacity:
+        filters["capacity"] = capacity
+    if color:
+        filters["color"] = color
+    return intents[0], filters, "matched"
+
+
+def _product_block(row: Dict[str, Any], intent: str) -> str:
+    lines = [f"#### {row['name']}"]
+    if row.get("capacity"):
+        lines.append(f"- **Dung lượng**: {row['capacity']}")
+    if row.get("color"):
+        lines.append(f"- **Màu sắc**: {row['color']}")
+    if intent == "price":
+        lines.append(f"- **Giá**: {row['price']}")
+        if row.get("original_price") and row["original_price"] != row["price"]:
+            lines.append(f"- **Giá gốc**: {row['original_price']}")
+    if intent == "address" and row.get("address"):
+        lines.append(f"- **Có tại**: {row['address']}")
+    return "\n".join(lines)
+
+
+_INTROS = {
+    "price": "Dưới đây là giá hiện tại của sản phẩm bạn hỏi tại Hoàng Hà Mobile:",
+    "address": "Bạn có thể mua sản phẩm này tại các cửa hàng sau của Hoàng Hà Mobile:",
+}
+
+
+def render_answer(intent: str, rows: List[Dict[str, Any]]) -> str:
+    """
+    Câu trả lời theo template cố định, cùng định dạng Markdown với câu trả lời của agent.
+    """
+    blocks = "\n\n".join(_product_block(row, intent) for row in rows)
+    return f"{_INTROS[intent]}\n\n{blocks}\n\nBạn có cần tư vấn thêm về sản phẩm nào không?"
+
+
+class IntentRouter:
+    """
+    Đường tắt trước agent cho các câu hỏi tra cứu giá/địa chỉ của một sản phẩm:
+    chạy thẳng flexible_product_search và trả lời bằng template, không gọi LLM.
+    Câu hỏi không chắc chắn hoặc không tìm được kết quả đủ cụ thể sẽ quay về agent.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = INTENT_ROUTER_ENABLED,
+        max_rows: int = INTENT_ROUTER_MAX_ROWS,
+        vocabulary_ttl: float = INTENT_ROUTER_VOCABULARY_TTL,
+    ):
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.vocabulary_ttl = vocabulary_ttl
+
+        self._vocabulary: Optional[Set[str]] = None
+        self._vocabulary_version: Optional[int] = None
+        self._vocabulary_checked_at = 0.0
+
+        self.routed: Dict[str, int] = {}
+        self.fallbacks: Dict[str, int] = {}
+        self.fast_path_ms = 0.0
+        self.agent_requests = 0
+        self.agent_ms = 0.0
+
+    def _fallback(self, reason: str) -> None:
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+
+    @property
+    def avg_agent_ms(self) -> float:
+        return self.agent_ms / self.agent_requests if self.agent_requests else 0.0
+
+    def record_agent_ms(self, ms: float) -> None:
+        """
+        Ghi thời gian một request đi qua agent, dùng để ước lượng thời gian tiết kiệm được.
+        """
+        self.agent_requests += 1
+        self.agent_ms += ms
+
+    async def _aname_vocabulary(self) -> Set[str]:
+        """
+        Các từ của tên sản phẩm trong catalog, nạp lại khi phiên bản catalog thay đổi.
+        """
+        if self._vocabulary is not None and time.monotonic() - self._vocabulary_checked_at < self.vocabulary_ttl:
+            return self._vocabulary
+
+        version = await aget_catalog_version()
+        if self._vocabulary is None or version != self._vocabulary_version:
+            async with get_pool().connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT name FROM products")
+                    rows = await cursor.fetchall()
+            self._vocabulary = name_vocabulary(row["name"] for row in rows)
+            self._vocabulary_version = version
+        self._vocabulary_checked_at = time.monotonic()
+        return self._vocabulary
+
+    async def aroute(self, question: str, has_history: bool = False) -> Optional[str]:
+        """
+        Trả về câu trả lời theo template, hoặc None nếu câu hỏi cần đi qua agent.
+        Câu hỏi giữa cuộc trò chuyện có thể dựa vào ngữ cảnh trước đó nên luôn đi qua agent,
+        giống answer cache.
+        """
+        if not self.enabled:
+            return None
+        if has_history:
+            self._fallback("has_history")
+            return None
+
+        start = time.perf_counter()
+        intent, filters, reason = detect_intent(question, await self._aname_vocabulary())
+        if intent is None:
+            self._fallback(reason)
+            logger.debug(f"Intent router fallback ({reason}): {question!r}")
+            return None
+
+        # Mọi từ của tên/màu phải khớp; dung lượng là một giá trị nên giữ OR mặc định
+        rows = await aget_flexible_product_search(
+            use_columns=ROUTED_COLUMNS,
+            **filters,
+            operator_flags={"name": "AND", "color": "AND"},
+            limit=self.max_rows + 1,
+        )
+        if not rows or len(rows) > self.max_rows:
+            reason = "no_results" if not rows else "too_many_results"
+            self._fallback(reason)
+            logger.info(f"Intent router fallback ({reason}) for {intent} lookup {filters}")
+            return None
+
+        answer = render_answer(intent, rows)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.routed[intent] = self.routed.get(intent, 0) + 1
+        self.fast_path_ms += elapsed_ms
+        logger.info(
+            f"Intent router answered {intent} lookup {filters} ({len(rows)} rows) in {elapsed_ms:.1f} ms, "
+            f"~{max(self.avg_agent_ms - elapsed_ms, 0.0):.0f} ms saved vs agent"
+        )
+        return answer
+
+    def stats(self) -> Dict[str, Any]:
+        routed = sum(self.routed.values())
+        fallbacks = sum(self.fallbacks.values())
+        avg_fast_ms = self.fast_path_ms / routed if routed else 0.0
+        return {
+            "enabled": self.enabled,
+            "routed": routed,
+            "routed_by_intent": dict(self.routed),
+            "fallbacks": fallbacks,
+            "fallbacks_by_reason": dict(self.fallbacks),
+            "route_ratio": (routed / (routed + fallbacks)) if routed + fallbacks else 0.0,
+            "avg_fast_path_ms": avg_fast_ms,
+            "agent_requests": self.agent_requests,
+            "avg_agent_ms": self.avg_agent_ms,
+            # Ước lượng theo thời gian trung bình của các request đi qua agent
+            "estimated_saved_ms": max(self.avg_agent_ms - avg_fast_ms, 0.0) * routed,
+        }
+
+
+intent_router = IntentRouter()
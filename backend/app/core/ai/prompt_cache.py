@@ -0,0 +1,112 @@
+import time
+import logging
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+
+class _Totals:
+    __slots__ = ("calls", "ttft_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.ttft_ms = 0.0
+
+    def add(self, ttft_ms: Optional[float]) -> None:
+        if ttft_ms is not None:
+            self.calls += 1
+            self.ttft_ms += ttft_ms
+
+    def avg(self) -> float:
+        return self.ttft_ms / self.calls if self.calls else 0.0
+
+
+class PromptCacheStats(BaseCallbackHandler):
+    """
+    Callback ghi lại số token prompt được provider lấy từ prompt cache (usage.prompt_tokens_details.cached_tokens)
+    của mỗi lần gọi chat model, cùng thời gian tới token đầu tiên (TTFT) tách theo có/không trúng cache.
+
+    Cần stream_usage=True để usage có trong response khi streaming.
+    """
+
+    # Các callback chỉ cập nhật bộ đếm: chạy ngay trên event loop thay vì trong thread pool cho mỗi token
+    run_inline = True
+
+    def __init__(self):
+        super().__init__()
+        self._started: Dict[UUID, float] = {}
+        self._first_token: Dict[UUID, float] = {}
+
+        self.llm_calls = 0
+        self.calls_with_usage = 0
+        self.cache_hit_calls = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self._ttft_hit = _Totals()
+        self._ttft_miss = _Totals()
+        self.last: Dict[str, Any] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id not in self._first_token and run_id in self._started:
+            self._first_token[run_id] = time.perf_counter()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+        self._first_token.pop(run_id, None)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        first_token = self._first_token.pop(run_id, None)
+        ttft_ms = (first_token - started) * 1000 if started is not None and first_token is not None else None
+
+        self.llm_calls += 1
+        usage = self._usage(response)
+        if usage is None:
+            return
+
+        input_tokens = usage.get("input_tokens", 0)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        self.calls_with_usage += 1
+        self.input_tokens += input_tokens
+        self.cached_tokens += cached_tokens
+        if cached_tokens:
+            self.cache_hit_calls += 1
+            self._ttft_hit.add(ttft_ms)
+        else:
+            self._ttft_miss.add(ttft_ms)
+
+        self.last = {"input_tokens": input_tokens, "cached_tokens": cached_tokens, "ttft_ms": ttft_ms}
+        logger.debug(f"LLM call: {input_tokens} input tokens, {cached_tokens} cached, TTFT {ttft_ms} ms")
+
+    @staticmethod
+    def _usage(response: LLMResult) -> Optional[Dict[str, Any]]:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    return usage
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "calls_with_usage": self.calls_with_usage,
+            "cache_hit_calls": self.cache_hit_calls,
+            "call_hit_ratio": (self.cache_hit_calls / self.calls_with_usage) if self.calls_with_usage else 0.0,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "token_hit_ratio": (self.cached_tokens / self.input_tokens) if self.input_tokens else 0.0,
+            "avg_ttft_ms_cache_hit": self._ttft_hit.avg(),
+            "avg_ttft_ms_cache_miss": self._ttft_miss.avg(),
+            "last": self.last,
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,68 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+async def _timed(awaitable: Awaitable, timings: Dict[str, float], name: str) -> Any:
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+class RequestPrepStats:
+    """
+    Thời gian của từng bước chuẩn bị request (lấy lịch sử, đếm token, lấy agent) trước lần gọi LLM.
+    Các bước chạy đồng thời nên tổng thời gian gần với bước chậm nhất thay vì tổng các bước.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.stage_total_ms: Dict[str, float] = {}
+        self.stage_max_ms: Dict[str, float] = {}
+        self.last: Dict[str, float] = {}
+
+    def record(self, timings: Dict[str, float], total_ms: float) -> None:
+        self.requests += 1
+        self.total_ms += total_ms
+        for name, ms in timings.items():
+            self.stage_total_ms[name] = self.stage_total_ms.get(name, 0.0) + ms
+            self.stage_max_ms[name] = max(self.stage_max_ms.get(name, 0.0), ms)
+        self.last = {**timings, "total": total_ms}
+
+    def stats(self) -> Dict[str, Any]:
+        n = self.requests or 1
+        return {
+            "requests": self.requests,
+            "avg_total_ms": self.total_ms / n,
+            # Tổng trung bình các bước nếu chạy tuần tự, để so sánh với avg_total_ms
+            "avg_serial_ms": sum(self.stage_total_ms.values()) / n,
+            "stages": {
+                name: {"avg_ms": total / n, "max_ms": self.stage_max_ms[name]}
+                for name, total in self.stage_total_ms.items()
+            },
+            "last": self.last,
+        }
+
+
+request_prep_stats = RequestPrepStats()
+
+
+async def run_stages(stages: Dict[str, Awaitable]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Chạy các bước độc lập đồng thời, trả về (kết quả theo tên bước, thời gian từng bước tính bằng ms).
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    names = list(stages)
+    values = await asyncio.gather(*(_timed(stages[name], timings, name) for name in names))
+    total_ms = (time.perf_counter() - start) * 1000
+
+    request_prep_stats.record(timings, total_ms)
+    logger.debug(f"Request prep {total_ms:.1f} ms: {timings}")
+    return dict(zip(names, values)), timings
@@ -1,17 +1,30 @@
 from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.tools import BaseTool
 from langchain_core.prompts import MessagesPlaceholder, ChatPromptTemplate
 from langchain_core.utils.function_calling import convert_to_openai_function
 import os
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any, AsyncGenerator
-from app.database.chat_history_service import insert_chat_history, get_chat_history, format_chat_history
+from typing import Optional, Dict, Any, AsyncGenerator, Awaitable, List, Tuple
+from app.database.chat_history_service import select_history_within_budget
+from app.database.history_cache import aget_recent_chat_history, aget_recent_chat_turns, asave_chat_turn
+from app.core.metrics import StageMetricsHandler, observe_stage, timed_stage
+from .tokens import count_tokens
+from .answer_cache import answer_cache, split_answer_chunks
+from .request_prep import run_stages
+from .intent_router import intent_router
+from .prompt_cache import prompt_cache_stats
 from .tools import ProductSearchTool, ProductPriceTool, ProductAddressTool, ProductSpecsTool, ProductPolicyTool, SearchWebTool, FlexibleProductSearchTool
-from .prompts import product_prompt, product_prompt_2, product_prompt_4, product_prompt_5, product_prompt_6
+from . import prompts
 from datetime import datetime
 from openai import RateLimitError
-import tiktoken
+import asyncio
+import hashlib
+import importlib
+import time
+from functools import lru_cache
 
 load_dotenv()
 
@@ -19,6 +32,11 @@ OPEN_API_API_KEY = os.getenv("OPENAI_API_KEY")
 if OPEN_API_API_KEY is None:
     raise ValueError("OPENAI_API_KEY environment variable not set.")
 
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
+# Endpoint tương thích OpenAI khác (vd. server giả của benchmarks), mặc định là API của OpenAI
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "25000"))
+
 product_search_tools = ProductSearchTool()
 product_price_tools = ProductPriceTool()
 product_address_tools = ProductAddressTool()
@@ -27,27 +45,50 @@ product_policy_tools = ProductPolicyTool()
 search_web_tools = SearchWebTool()
 flexible_product_search_tools = FlexibleProductSearchTool()
 
+# Cache agent theo (model, prompt version), dùng chung cho mọi request
+_agent_cache: Dict[Tuple[str, str], AgentExecutor] = {}
+
 
 class CustomerHandler(BaseCallbackHandler):
+    # Handler đồng bộ gắn vào LLM nhận mọi token khi streaming: chạy ngay trên event loop
+    # thay vì đưa mỗi callback vào thread pool
+    run_inline = True
+
     def __init__(self):
         super().__init__()
 
     def on_chat_message(self, message: str, **kwargs: Any) -> None:
         print(f"Chat message saved: {message}")
 
-def get_llm_and_agent() -> AgentExecutor:
-    llm_products = ChatOpenAI(
+@lru_cache(maxsize=8)
+def get_prompt_version(prompt_text: str) -> str:
+    """
+    Phiên bản của prompt, tính từ nội dung để biết khi nào cần build lại agent
+    """
+    return hashlib.sha1(prompt_text.encode("utf-8")).hexdigest()[:12]
+
+@timed_stage("agent_build")
+def build_llm_and_agent(
+    model: str,
+    prompt_text: str,
+    llm: Optional[BaseChatModel] = None,
+    tools: Optional[List[BaseTool]] = None,
+) -> AgentExecutor:
+    llm_products = llm or ChatOpenAI(
         openai_api_key=OPEN_API_API_KEY,
-        model="gpt-4.1",
+        base_url=OPENAI_BASE_URL,
+        model=model,
         temperature=0.7,
         max_tokens=3000,
         top_p=1,
         frequency_penalty=0,
         streaming=True,
-        callbacks=[CustomerHandler()],
+        # Usage (kể cả cached_tokens) cũng được trả về khi streaming
+        stream_usage=True,
+        callbacks=[CustomerHandler(), prompt_cache_stats],
     )
 
-    tools = [
+    tools = tools or [
         # product_search_tools,
         # product_price_tools,
         # product_address_tools,
@@ -59,19 +100,21 @@ def get_llm_and_agent() -> AgentExecutor:
 
     # functions = [convert_to_openai_function(tool) for tool in tools]
 
-    current_date = datetime.now()
-
-
+    # System prompt lớn không chứa giá trị thay đổi theo request nên phần đầu prompt giống hệt nhau
+    # giữa các request và được provider cache; ngày hiện tại nằm ở system message sau lịch sử chat
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", product_prompt_6.format(current_date=current_date)),
+            ("system", prompt_text),
             MessagesPlaceholder(variable_name="chat_history"),
+            ("system", "Current date: {current_date}"),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ]
     )
 
-    agent = create_openai_functions_agent(llm=llm_products, tools=tools, prompt=prompt)
+    # Tools agent: model có thể gọi nhiều tool trong một lượt, AgentExecutor chạy chúng
+    # đồng thời bằng asyncio.gather (mỗi tool tự giới hạn thời gian trong _arun)
+    agent = create_openai_tools_agent(llm=llm_products, tools=tools, prompt=prompt)
     agent_executor = AgentExecutor(
         agent=agent,
         tools=tools,
@@ -85,7 +128,72 @@ def get_llm_and_agent() -> AgentExecutor:
 
     return agent_executor
 
-def get_answer_from_llm(
+def get_llm_and_agent(model: str = OPENAI_MODEL) -> AgentExecutor:
+    """
+    Lấy agent từ cache theo (model, prompt version), chỉ build khi chưa có
+    """
+    prompt_text = prompts.product_prompt_6
+    key = (model, get_prompt_version(prompt_text))
+
+    agent_executor = _agent_cache.get(key)
+    if agent_executor is None:
+        agent_executor = build_llm_and_agent(model, prompt_text)
+        _agent_cache[key] = agent_executor
+    return agent_executor
+
+async def aget_llm_and_agent(model: str = OPENAI_MODEL) -> AgentExecutor:
+    """
+    Như get_llm_and_agent; khi agent chưa có trong cache thì build trong thread
+    để không chặn event loop và các bước chuẩn bị khác
+    """
+    agent_executor = _agent_cache.get((model, get_prompt_version(prompts.product_prompt_6)))
+    if agent_executor is not None:
+        return agent_executor
+    return await asyncio.to_thread(get_llm_and_agent, model)
+
+async def aprepare_request(user_input: str, history: Awaitable) -> Dict[str, Any]:
+    """
+    Chuẩn bị request trước lần gọi LLM: lấy lịch sử, đếm token câu hỏi (trong thread,
+    lần đầu phải nạp tokenizer) và lấy agent chạy đồng thời; thời gian từng bước được ghi lại.
+    """
+    results, _ = await run_stages({
+        "history": history,
+        "input_tokens": asyncio.to_thread(count_tokens, user_input),
+        "agent": aget_llm_and_agent(),
+    })
+    return results
+
+def get_current_date() -> str:
+    # Chỉ lấy ngày (không có giờ) để giá trị thay đổi ít nhất có thể
+    return datetime.now().strftime("%Y-%m-%d")
+
+def warm_agent_cache(model: str = OPENAI_MODEL) -> AgentExecutor:
+    """
+    Build agent khi khởi động ứng dụng để request đầu tiên không phải chờ
+    """
+    return get_llm_and_agent(model)
+
+def get_answer_cache_scope(model: str = OPENAI_MODEL) -> str:
+    # Câu trả lời đã cache chỉ dùng lại với cùng model và cùng phiên bản prompt
+    return f"{model}:{get_prompt_version(prompts.product_prompt_6)}"
+
+def reload_agent(model: str = OPENAI_MODEL) -> Dict[str, Any]:
+    """
+    Hot-reload: nạp lại module prompts, build lại agent nếu prompt thay đổi
+    và bỏ các agent của phiên bản prompt cũ
+    """
+    importlib.reload(prompts)
+    version = get_prompt_version(prompts.product_prompt_6)
+
+    for key in list(_agent_cache):
+        if key[1] != version:
+            _agent_cache.pop(key, None)
+
+    get_llm_and_agent(model)
+    return {"model": model, "prompt_version": version, "cached_agents": len(_agent_cache)}
+
+@timed_stage("chat_request")
+async def get_answer_from_llm(
     user_input: str,
     thread_id: str,
 ) -> Dict[str, Any]:
@@ -105,23 +213,46 @@ def get_answer_from_llm(
         raise ValueError("Thread ID cannot be None.")
 
 
-    agent_executor = get_llm_and_agent()
-
-    # Get the chat history
-    chat_history = get_chat_history(thread_id=thread_id)
-    formatted_chat_history = format_chat_history(chat_history)
+    # Get the chat history, the question's token count and the agent concurrently
+    prepared = await aprepare_request(user_input, aget_recent_chat_history(thread_id=thread_id))
+    agent_executor = prepared["agent"]
+    formatted_chat_history = prepared["history"]
+    input_tokens = prepared["input_tokens"]
+    has_history = bool(formatted_chat_history)
+    cache_scope = get_answer_cache_scope()
 
-    response = agent_executor.invoke(
-        {
-            "input": user_input,
-            "chat_history": formatted_chat_history,
-        },
-    )
+    direct_answer = await answer_cache.aget(user_input, cache_scope, has_history)
+    if direct_answer is None:
+        # Tra cứu giá/địa chỉ đơn giản ở lượt đầu: trả lời bằng template, không qua agent
+        direct_answer = await intent_router.aroute(user_input, has_history)
+    if direct_answer is not None:
+        response = {"input": user_input, "chat_history": formatted_chat_history, "output": direct_answer, "intermediate_steps": []}
+    else:
+        agent_start = time.perf_counter()
+        response = await agent_executor.ainvoke(
+            {
+                "input": user_input,
+                "chat_history": formatted_chat_history,
+                "current_date": get_current_date(),
+            },
+            # Đo từng lần gọi model và từng tool của request này (xem /metrics)
+            config={"callbacks": [StageMetricsHandler()]},
+        )
+        intent_router.record_agent_ms((time.perf_counter() - agent_start) * 1000)
+        if isinstance(response, dict) and "output" in response:
+            tools_used = {action.tool for action, _ in response.get("intermediate_steps", [])}
+            await answer_cache.aput(user_input, cache_scope, response["output"], has_history, tools_used)
     
     # Save the chat history
     if isinstance(response, dict) and "output" in response:
         # insert_chat_history(thread_id, user_input, response)
-        insert_chat_history(thread_id, user_input, response["output"])
+        await asave_chat_turn(
+            thread_id,
+            user_input,
+            response["output"],
+            input_tokens,
+            count_tokens(response["output"]),
+        )
 
     return response
 
@@ -129,62 +260,78 @@ async def get_answer_streaming(
     user_input: str,
     thread_id: str,
 ) -> AsyncGenerator[Dict, None]:
+    # Các phần câu trả lời được nối một lần ở cuối (tránh nối chuỗi lặp lại)
+    answer_parts: List[str] = []
+    input_tokens = None
+    request_start = time.perf_counter()
+    outcome = "ok"
     try:
-        # Implement token counting
-        enc = tiktoken.get_encoding("o200k_base")
-        input_tokens = len(enc.encode(user_input))
-        
-        # Get limited chat history to prevent token overflow
-        chat_history = get_chat_history(thread_id=thread_id, limit=10)  # Only get last 10 messages
-        formatted_chat_history = format_chat_history(chat_history)
-        
-        # Đảo ngược lịch sử để bắt đầu từ tin nhắn mới nhất
-        reversed_history = list(reversed(formatted_chat_history))
-
-        # Khởi tạo biến để lưu trữ lịch sử đã cắt và tổng số token
-        trimmed_history = []
-        total_tokens = input_tokens
-
-        # Duyệt qua lịch sử từ mới nhất đến cũ nhất
-        for msg in reversed_history:
-            msg_tokens = len(enc.encode(str(msg)))
-            if total_tokens + msg_tokens > 25000:
-                break
-            trimmed_history.insert(0, msg)  # Chèn vào đầu danh sách
-            total_tokens += msg_tokens
-            
-        agent_executor = get_llm_and_agent()
-        final_answer = ""
+        # Get limited chat history (last 10 turns), count the question's tokens
+        # and get the agent concurrently
+        prepared = await aprepare_request(user_input, aget_recent_chat_turns(thread_id=thread_id, limit=10))
+        input_tokens = prepared["input_tokens"]
+        chat_history = prepared["history"]
+        agent_executor = prepared["agent"]
+
+        # Câu hỏi lặp lại: stream câu trả lời đã cache theo cùng định dạng, không gọi agent
+        has_history = bool(chat_history)
+        cache_scope = get_answer_cache_scope()
+        direct_answer = await answer_cache.aget(user_input, cache_scope, has_history)
+        if direct_answer is None:
+            # Tra cứu giá/địa chỉ đơn giản ở lượt đầu: trả lời bằng template, không qua agent
+            direct_answer = await intent_router.aroute(user_input, has_history)
+        if direct_answer is not None:
+            for chunk in split_answer_chunks(direct_answer):
+                answer_parts.append(chunk)
+                yield chunk
+            return
+
+        # Chọn lịch sử vừa ngân sách token bằng số token đã lưu của từng lượt chat
+        trimmed_history = select_history_within_budget(chat_history, HISTORY_TOKEN_BUDGET, input_tokens)
+
+        tools_used = set()
+        agent_start = time.perf_counter()
 
         async for event in agent_executor.astream_events(
             {
                 "input": user_input,
                 "chat_history": trimmed_history,
+                "current_date": get_current_date(),
             },
+            config={"callbacks": [StageMetricsHandler()]},
         ):
             kind = event["event"]
-            if kind == "on_chat_model_stream":
+            if kind == "on_tool_start":
+                tools_used.add(event["name"])
+            elif kind == "on_chat_model_stream":
                 chunk = event["data"].get("chunk")
                 if chunk and hasattr(chunk, "content"):
                     content = chunk.content
                     if content:
-                        final_answer += content
+                        answer_parts.append(content)
                         yield content
+
+        intent_router.record_agent_ms((time.perf_counter() - agent_start) * 1000)
+        await answer_cache.aput(user_input, cache_scope, "".join(answer_parts), has_history, tools_used)
     
     except RateLimitError as e:
+        outcome = "rate_limited"
         error_message = "I apologize, but I'm receiving too many requests right now. Please try again in a few moments."
         yield error_message
         return
 
     except Exception as e:
+        outcome = "error"
         error_message = f"An error occurred: {str(e)}"
         yield error_message
         return
 
     finally:
+        observe_stage("chat_stream_request", time.perf_counter() - request_start, outcome)
+        final_answer = "".join(answer_parts)
         if final_answer and final_answer.strip():
             try:
-                insert_chat_history(thread_id, user_input, final_answer)
+                await asave_chat_turn(thread_id, user_input, final_answer, input_tokens, count_tokens(final_answer))
             except Exception as e:
                 print(f"Error inserting chat history: {str(e)}")
 
@@ -0,0 +1,18 @@
+import tiktoken
+from functools import lru_cache
+
+TOKEN_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding() -> tiktoken.Encoding:
+    """
+    Nạp encoder một lần cho mỗi tiến trình
+    """
+    return tiktoken.get_encoding(TOKEN_ENCODING)
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(get_encoding().encode(text))
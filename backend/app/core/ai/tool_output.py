@@ -0,0 +1,150 @@
+import os
+import re
+import logging
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, Dict, List, Tuple
+from .tokens import count_tokens, get_encoding
+
+load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+# Ngân sách token cho kết quả của từng tool được đưa lại vào agent_scratchpad
+PRODUCT_SEARCH_TOOL_MAX_TOKENS = int(os.getenv("PRODUCT_SEARCH_TOOL_MAX_TOKENS", "2000"))
+WEB_SEARCH_TOOL_MAX_TOKENS = int(os.getenv("WEB_SEARCH_TOOL_MAX_TOKENS", "1500"))
+TOOL_OUTPUT_MAX_ROWS = int(os.getenv("TOOL_OUTPUT_MAX_ROWS", "20"))
+# Giá trị dài chỉ bị cắt khi bảng vượt ngân sách, và không bao giờ ngắn hơn mức này
+TOOL_OUTPUT_FIELD_MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_FIELD_MAX_TOKENS", "150"))
+
+_WHITESPACE_RE = re.compile(r"\s*\n\s*")
+
+
+def truncate_tokens(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """
+    Cắt text còn tối đa max_tokens token (encoding o200k_base), trả về (text, có bị cắt không).
+    """
+    tokens = get_encoding().encode(text)
+    if len(tokens) <= max_tokens:
+        return text, False
+    return get_encoding().decode(tokens[:max_tokens]).rstrip() + "…", True
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    # Mỗi dòng của bảng là một sản phẩm: bỏ xuống dòng và ký tự phân cột trong giá trị
+    return _WHITESPACE_RE.sub("; ", str(value).strip()).replace("|", "/")
+
+
+def _field_cap(token_counts: List[int], row_budget: int, min_cap: int) -> int:
+    """
+    Giới hạn token cho mỗi giá trị trong một dòng sao cho cả dòng vừa row_budget:
+    giá trị ngắn giữ nguyên, phần còn lại chia đều cho các giá trị dài. Không nhỏ hơn min_cap.
+    """
+    remaining = row_budget
+    counts = sorted(token_counts)
+    for i, count in enumerate(counts):
+        share = remaining // (len(counts) - i)
+        if count > share:
+            return max(share, min_cap)
+        remaining -= count
+    return max(counts[-1] if counts else 0, min_cap)
+
+
+def serialize_rows(
+    rows: List[Dict[str, Any]],
+    max_tokens: int = PRODUCT_SEARCH_TOOL_MAX_TOKENS,
+    max_rows: int = TOOL_OUTPUT_MAX_ROWS,
+    field_max_tokens: int = TOOL_OUTPUT_FIELD_MAX_TOKENS,
+) -> str:
+    """
+    Chuyển các dòng kết quả thành bảng gọn (một dòng tiêu đề, các cột cách nhau bởi " | ")
+    thay vì repr của list dict. Số dòng bị giới hạn theo max_rows và ngân sách token;
+    ngân sách được chia đều cho các dòng và giá trị dài chỉ bị cắt khi dòng vượt phần của nó
+    (một dòng thông số/chính sách được giữ gần như đầy đủ, nhiều dòng thì mỗi giá trị còn
+    tối thiểu field_max_tokens). Phần bị bỏ được ghi ở dòng cuối để model biết kết quả chưa đầy đủ.
+    """
+    if not rows:
+        return "No matching products."
+
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    header = " | ".join(columns)
+    lines = [header]
+    used = count_tokens(header) + 1
+    shortened_fields = 0
+
+    candidates = rows[:max_rows]
+    # Mỗi dấu phân cột và xuống dòng tính khoảng một token
+    row_budget = (max_tokens - used) // len(candidates) - len(columns)
+
+    for row in candidates:
+        values = [_cell(row.get(column)) for column in columns]
+        cap = _field_cap([count_tokens(value) for value in values], row_budget, field_max_tokens)
+        cells = []
+        row_shortened = 0
+        for value in values:
+            text, cut = truncate_tokens(value, cap)
+            row_shortened += cut
+            cells.append(text)
+        line = " | ".join(cells)
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > max_tokens and len(lines) > 1:
+            break
+        lines.append(line)
+        used += line_tokens
+        shortened_fields += row_shortened
+
+    shown = len(lines) - 1
+    notes = []
+    if shown < len(rows):
+        notes.append(f"showing {shown} of {len(rows)} rows")
+    if shortened_fields:
+        notes.append(f"{shortened_fields} long values shortened")
+    if notes:
+        lines.append(f"[truncated: {'; '.join(notes)}]")
+        logger.debug(f"Tool output truncated to ~{used} tokens: {notes}")
+
+    return "\n".join(lines)
+
+
+def serialize_web_results(
+    response: Dict[str, Any],
+    max_tokens: int = WEB_SEARCH_TOOL_MAX_TOKENS,
+    field_max_tokens: int = TOOL_OUTPUT_FIELD_MAX_TOKENS * 2,
+) -> str:
+    """
+    Kết quả tìm kiếm web: tóm tắt (nếu có) rồi từng kết quả với tiêu đề, URL và nội dung đã cắt,
+    dừng khi hết ngân sách token.
+    """
+    parts = []
+    used = 0
+    if response.get("answer"):
+        summary, _ = truncate_tokens(_cell(response["answer"]), field_max_tokens)
+        parts.append(f"🔎 Tóm tắt: {summary}")
+        used += count_tokens(parts[0])
+
+    results = response.get("results", [])
+    shortened_fields = 0
+    shown = 0
+    for idx, result in enumerate(results, 1):
+        title = _cell(result.get("title")) or "Không có tiêu đề"
+        url = result.get("url") or "Không có URL"
+        content, cut = truncate_tokens(_cell(result.get("content")) or "Không có nội dung", field_max_tokens)
+        part = f"{idx}. {title}\nURL: {url}\n{content}"
+        part_tokens = count_tokens(part) + 2
+        if used + part_tokens > max_tokens and shown:
+            break
+        parts.append(part)
+        used += part_tokens
+        shown += 1
+        shortened_fields += cut
+
+    notes = []
+    if shown < len(results):
+        notes.append(f"showing {shown} of {len(results)} results")
+    if shortened_fields:
+        notes.append(f"{shortened_fields} long contents shortened")
+    if notes:
+        parts.append(f"[truncated: {'; '.join(notes)}]")
+
+    return "\n\n".join(parts)
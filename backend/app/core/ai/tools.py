@@ -1,17 +1,29 @@
 from ast import List
 import os
+import asyncio
 from dotenv import load_dotenv
 from typing import Dict, Any, Optional, Annotated, List
 from pydantic import BaseModel, Field
 from langchain.tools import BaseTool
-from app.database.product_service import get_product_by_name, get_products_by_price, get_product_by_address, get_product_by_specs, get_flexible_product_search
+from app.database.product_service import get_product_by_name, get_products_by_price, get_product_by_address, get_product_by_specs, get_flexible_product_search, aget_flexible_product_search
 from decimal import Decimal
-from tavily import TavilyClient
-import requests
+from .web_search import web_search
+from .tool_output import serialize_rows, serialize_web_results, PRODUCT_SEARCH_TOOL_MAX_TOKENS, WEB_SEARCH_TOOL_MAX_TOKENS
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Thời gian tối đa cho một lần gọi tool (async); khi hết giờ model nhận thông báo lỗi thay vì chờ mãi
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "15"))
+WEB_SEARCH_TOOL_TIMEOUT = float(os.getenv("WEB_SEARCH_TOOL_TIMEOUT", "20"))
+
+async def run_with_timeout(tool_name: str, coro, timeout: float):
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"Tool {tool_name} timed out after {timeout:g}s")
+        return f"Error: {tool_name} timed out after {timeout:g}s"
+
 class FlexibleProductSearch(BaseModel):
     use_columns: Optional[List[str]] = Field(
         default=["name", "color", "capacity", "price", "image_url", "specifications"],
@@ -89,6 +101,9 @@ class FlexibleProductSearchTool(BaseTool):
         "price proximity or range, discount percent range, sort and limit results"
     )
     args_schema: type[BaseModel] = FlexibleProductSearch
+    timeout: float = TOOL_TIMEOUT
+    # Kết quả trả cho model được rút gọn thành bảng trong ngân sách token này
+    max_output_tokens: int = PRODUCT_SEARCH_TOOL_MAX_TOKENS
 
     def _run(
         self,
@@ -107,8 +122,8 @@ class FlexibleProductSearchTool(BaseTool):
         discount_percent: Optional[List[float]] = None,
         sort_by: str = "",
         limit: int = 0
-    ) -> Optional[List[Dict]]:
-        return get_flexible_product_search(
+    ) -> str:
+        rows = get_flexible_product_search(
             use_columns=use_columns,
             name=name,
             capacity=capacity,
@@ -125,8 +140,52 @@ class FlexibleProductSearchTool(BaseTool):
             sort_by=sort_by,
             limit=limit
         )
+        return serialize_rows(rows, self.max_output_tokens)
+
+    async def _arun(
+        self,
+        use_columns: Optional[List[str]] = None,
+        name: Optional[List[str]] = None,
+        capacity: Optional[List[str]] = None,
+        price: float = 0,
+        color: Optional[List[str]] = None,
+        policy: Optional[List[str]] = None,
+        product_information: Optional[List[str]] = None,
+        address: Optional[List[str]] = None,
+        operator_flags: Optional[Dict[str, str]] = None,
+        condition_groups: Optional[Dict[str, List[str]]] = None,
+        group_operator: str = "AND",
+        price_range: Optional[List[float]] = None,
+        discount_percent: Optional[List[float]] = None,
+        sort_by: str = "",
+        limit: int = 0
+    ) -> str:
+        # Chạy trên pool async thay vì chiếm một thread của executor mặc định
+        rows = await run_with_timeout(self.name, aget_flexible_product_search(
+            use_columns=use_columns,
+            name=name,
+            capacity=capacity,
+            price=price,
+            color=color,
+            policy=policy,
+            product_information=product_information,
+            address=address,
+            operator_flags=operator_flags,
+            condition_groups=condition_groups,
+            group_operator=group_operator,
+            price_range=price_range,
+            discount_percent=discount_percent,
+            sort_by=sort_by,
+            limit=limit
+        ), self.timeout)
+        # Hết giờ: run_with_timeout đã trả về thông báo lỗi dạng chuỗi
+        return rows if isinstance(rows, str) else serialize_rows(rows, self.max_output_tokens)
 
-def get_phone_news_by_tavily(q="latest iphone", **kwargs):
+def format_web_search_response(response: Dict, max_tokens: int = WEB_SEARCH_TOOL_MAX_TOKENS) -> str:
+    # Tóm tắt và từng kết quả (tiêu đề, URL, nội dung đã cắt) trong ngân sách token
+    return serialize_web_results(response, max_tokens)
+
+def get_phone_news_by_tavily(q="latest iphone", max_tokens=WEB_SEARCH_TOOL_MAX_TOKENS, **kwargs):
     """
     Fetches news articles from Google Custom Search API based on the given query, language, and country.
     Args:
@@ -136,35 +195,26 @@ def get_phone_news_by_tavily(q="latest iphone", **kwargs):
     """
 
     try:
-        TAVILY_API_KEY = os.getenv("TAVILY_API_KEY") 
-
-        tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-        
-        # Thực hiện tìm kiếm với các tham số bổ sung
-        response = tavily_client.search(
-            query=q,
-            include_answer=True,
-            max_results=5,
-            include_raw_content=True
-        )
-
-        result_str = ""
+        # Tìm kiếm qua cache (SQLite, có TTL) và gộp các truy vấn trùng đang chạy
+        response = web_search.search(q)
 
-        # Thêm câu trả lời tổng quan nếu có
-        if 'answer' in response and response['answer']:
-            result_str += f"🔎 Tóm tắt: {response['answer']}\n\n"
-
-        # Duyệt qua từng kết quả và thêm thông tin chi tiết
-        for idx, result in enumerate(response.get("results", []), 1):
-            title = result.get('title', 'Không có tiêu đề')
-            url = result.get('url', 'Không có URL')
-            content = result.get('content', 'Không có nội dung')
-            result_str += f"{idx}. {title}\nURL: {url}\n{content}\n\n"
+        result_str = format_web_search_response(response, max_tokens)
 
         print("---------search web:\n", result_str)
         return result_str
 
-    except requests.exceptions.RequestException as e:
+    except Exception as e:
+        print('error', e)
+        return f"Error: {e}"
+
+async def aget_phone_news_by_tavily(q="latest iphone", max_tokens=WEB_SEARCH_TOOL_MAX_TOKENS, **kwargs):
+    """
+    Async version of get_phone_news_by_tavily using the shared httpx client.
+    """
+    try:
+        response = await web_search.asearch(q)
+        return format_web_search_response(response, max_tokens)
+    except Exception as e:
         print('error', e)
         return f"Error: {e}"
 
@@ -188,9 +238,14 @@ class SearchWebTool(BaseTool):
         "Excludes content about non-phone products."
     )
     args_schema: type[BaseModel] = SearchWeb
+    timeout: float = WEB_SEARCH_TOOL_TIMEOUT
+    max_output_tokens: int = WEB_SEARCH_TOOL_MAX_TOKENS
+
+    def _run(self, q: str) -> str:
+        return get_phone_news_by_tavily(q, self.max_output_tokens)
 
-    def _run(self, q: str) -> Optional[Dict]:
-        return get_phone_news_by_tavily(q)
+    async def _arun(self, q: str) -> str:
+        return await run_with_timeout(self.name, aget_phone_news_by_tavily(q, self.max_output_tokens), self.timeout)
 
 
 
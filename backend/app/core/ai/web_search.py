@@ -0,0 +1,283 @@
+import os
+import re
+import json
+import asyncio
+import functools
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from concurrent.futures import Future
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, Callable, Dict, Optional
+from app.core.metrics import timed_stage
+
+load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+WEB_SEARCH_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH", ".cache/web_search.sqlite3")
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", str(6 * 3600)))
+WEB_SEARCH_MAX_RESULTS = int(os.getenv("WEB_SEARCH_MAX_RESULTS", "5"))
+TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com")
+TAVILY_TIMEOUT = float(os.getenv("TAVILY_TIMEOUT", "30"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Khóa cache của câu truy vấn: NFC, chữ thường, gộp khoảng trắng.
+    Giữ nguyên dấu tiếng Việt vì kết quả tìm kiếm có thể khác nhau.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", query)).strip().lower()
+
+
+class WebSearchCache:
+    """
+    Cache kết quả tìm kiếm web có TTL, lưu trong file SQLite nên còn sau khi khởi động lại.
+    """
+
+    def __init__(self, path: str = WEB_SEARCH_CACHE_PATH, ttl: float = WEB_SEARCH_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS web_search_cache (
+                    key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM web_search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, query: str, response: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO web_search_cache (key, query, response, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, query, json.dumps(response, ensure_ascii=False), now, now + self.ttl),
+            )
+            # Dọn các dòng đã hết hạn
+            self._conn.execute("DELETE FROM web_search_cache WHERE expires_at < ?", (now,))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM web_search_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class AsyncTavilyClient:
+    """
+    Client Tavily bất đồng bộ gọi thẳng REST API qua httpx, dùng chung một AsyncClient
+    (giữ kết nối) cho mọi lần tìm kiếm.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = TAVILY_API_URL, client=None):
+        import httpx
+
+        self._client = client or httpx.AsyncClient(base_url=base_url, timeout=TAVILY_TIMEOUT)
+        self._headers = {"Authorization": f"Bearer {api_key or os.getenv('TAVILY_API_KEY')}"}
+
+    @timed_stage("tavily")
+    async def search(self, query: str, **kwargs) -> Dict[str, Any]:
+        response = await self._client.post("/search", json={"query": query, **kwargs}, headers=self._headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def _default_client():
+    from tavily import TavilyClient
+    return TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+
+
+def _default_async_client():
+    return AsyncTavilyClient()
+
+
+class CachedWebSearch:
+    """
+    Tìm kiếm web qua Tavily có cache. Các truy vấn giống nhau đang chạy đồng thời
+    được gộp thành một lần gọi upstream; lỗi không được cache.
+
+    search() dùng client đồng bộ của Tavily, asearch() dùng client httpx bất đồng bộ;
+    client_factory / async_client_factory cho phép thay bằng client giả khi kiểm thử.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[WebSearchCache] = None,
+        client_factory: Callable[[], Any] = _default_client,
+        async_client_factory: Callable[[], Any] = _default_async_client,
+        max_results: int = WEB_SEARCH_MAX_RESULTS,
+    ):
+        self._cache = cache
+        self._client_factory = client_factory
+        self._async_client_factory = async_client_factory
+        self._client = None
+        self._async_client = None
+        self.max_results = max_results
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    @property
+    def cache(self) -> WebSearchCache:
+        # Mở file SQLite khi cần lần đầu, không phải lúc import
+        if self._cache is None:
+            self._cache = WebSearchCache()
+        return self._cache
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = self._async_client_factory()
+        return self._async_client
+
+    def search(self, query: str) -> Dict[str, Any]:
+        key = normalize_query(query)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            self.upstream_calls += 1
+            response = self.client.search(
+                query=query,
+                include_answer=True,
+                max_results=self.max_results,
+            )
+            self.cache.set(key, query, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            self.upstream_errors += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def asearch(self, query: str) -> Dict[str, Any]:
+        key = normalize_query(query)
+
+        # SQLite dùng chung lock với các thread đồng bộ (và set() có commit) nên chạy trong thread
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        task = self._ainflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._afetch(key, query))
+            self._ainflight[key] = task
+            task.add_done_callback(functools.partial(self._afetch_done, key))
+        else:
+            self.coalesced += 1
+
+        # Lời gọi upstream là task riêng dùng chung cho mọi request cùng truy vấn: request bị hủy
+        # (timeout của tool, client ngắt kết nối) chỉ thôi chờ, các request khác vẫn nhận kết quả
+        return await asyncio.shield(task)
+
+    async def _afetch(self, key: str, query: str) -> Dict[str, Any]:
+        self.upstream_calls += 1
+        try:
+            response = await self.async_client.search(
+                query=query,
+                include_answer=True,
+                max_results=self.max_results,
+            )
+        except Exception:
+            self.upstream_errors += 1
+            raise
+        await asyncio.to_thread(self.cache.set, key, query, response)
+        return response
+
+    def _afetch_done(self, key: str, task: asyncio.Task) -> None:
+        self._ainflight.pop(key, None)
+        # Tránh cảnh báo "exception was never retrieved" khi mọi request đã thôi chờ
+        if not task.cancelled():
+            task.exception()
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats(self.cache.size())
+
+    async def astats(self) -> Dict[str, Any]:
+        """
+        Giống stats() nhưng đếm số entry SQLite trong thread, không chặn event loop.
+        """
+        return self._stats(await asyncio.to_thread(self.cache.size))
+
+    def _stats(self, entries: int) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "path": self.cache.path,
+            "ttl": self.cache.ttl,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": ((self.hits + self.coalesced) / lookups) if lookups else 0.0,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+        }
+
+
+web_search = CachedWebSearch()
@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import functools
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, Callable, Dict, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+load_dotenv(find_dotenv())
+
+STAGE_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_STAGE_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60"
+    ).split(",")
+)
+
+# Một histogram cho mọi bước của request chat; tool chỉ có giá trị với stage="tool"
+STAGE_LATENCY = Histogram(
+    "chatbot_stage_duration_seconds",
+    "Latency of each stage of a chat request",
+    ["stage", "tool", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok", tool: str = "") -> None:
+    STAGE_LATENCY.labels(stage=stage, tool=tool, outcome=outcome).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Nội dung cho /metrics theo định dạng text của Prometheus, kèm content type.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def timed_stage(stage: str) -> Callable:
+    """
+    Decorator đo thời gian của một hàm (sync hoặc async) vào histogram với outcome ok/error.
+    """
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    observe_stage(stage, time.perf_counter() - start, outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                observe_stage(stage, time.perf_counter() - start, outcome)
+        return wrapper
+
+    return decorator
+
+
+def tool_outcome(output: Any) -> str:
+    # Tool trả lỗi cho model dưới dạng chuỗi "Error: ..." (xem run_with_timeout) thay vì raise
+    if isinstance(output, str) and output.startswith("Error:"):
+        return "timeout" if "timed out" in output else "error"
+    return "ok"
+
+
+class StageMetricsHandler(BaseCallbackHandler):
+    """
+    Callback cho một request: đo từng lần gọi model (lần đầu / các lần sau khi có kết quả tool)
+    và từng lần gọi tool theo tên tool. Tạo mới cho mỗi request và truyền qua config callbacks.
+    """
+
+    # Chỉ ghi số đo nên chạy ngay trên event loop, không qua thread pool
+    run_inline = True
+
+    def __init__(self):
+        super().__init__()
+        self._llm_started: Dict[UUID, Tuple[str, float]] = {}
+        self._tool_started: Dict[UUID, Tuple[str, float]] = {}
+        self.llm_calls = 0
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        stage = "llm_first_call" if self.llm_calls == 0 else "llm_followup_call"
+        self.llm_calls += 1
+        self._llm_started[run_id] = (stage, time.perf_counter())
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_llm(run_id, "ok")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_llm(run_id, "error")
+
+    def _finish_llm(self, run_id: UUID, outcome: str) -> None:
+        started = self._llm_started.pop(run_id, None)
+        if started is not None:
+            stage, start = started
+            observe_stage(stage, time.perf_counter() - start, outcome)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._tool_started[run_id] = (name, time.perf_counter())
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, tool_outcome(output))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, "error")
+
+    def _finish_tool(self, run_id: UUID, outcome: str) -> None:
+        started = self._tool_started.pop(run_id, None)
+        if started is not None:
+            name, start = started
+            observe_stage("tool", time.perf_counter() - start, outcome, tool=name)
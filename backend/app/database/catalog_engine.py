@@ -0,0 +1,349 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+from dotenv import load_dotenv, find_dotenv
+from typing import List, Dict, Any, Optional
+from .pool import get_pool
+from .catalog_version import aget_catalog_version
+from .search_text import SEARCH_FIELDS, search_column, normalize_search_text, normalize_operator
+
+try:
+    import numpy as np
+except ImportError:  # numpy là tùy chọn, chỉ cần khi bật CATALOG_ENGINE=memory
+    np = None
+
+load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+CATALOG_ENGINE = os.getenv("CATALOG_ENGINE", "sql").lower()
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "5"))
+
+PRODUCT_COLUMNS = [
+    "id", "name", "color", "capacity", "price", "original_price",
+    "policy", "specifications", "address", "image_url", "product_information",
+]
+DEFAULT_COLUMNS = ["name", "capacity", "color", "price", "image_url", "specifications"]
+# Cột hiển thị tính sẵn khi seed/cập nhật, được trả về thay cho cột gốc cùng tên
+DISPLAY_COLUMNS = {
+    "price": "price_display",
+    "original_price": "original_price_display",
+    "capacity": "capacity_display",
+    "image_url": "image_url_display",
+}
+NGRAM_SIZE = 3
+
+
+def _like_regex(term: str) -> "re.Pattern":
+    """
+    Chuyển pattern LIKE '%term%' (term có ký tự đại diện % hoặc _) thành regex tương đương.
+    """
+    parts = []
+    escaped = False
+    for ch in f"%{term}%":
+        if escaped:
+            parts.append(re.escape(ch))
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def _longest_literal(term: str) -> str:
+    return max(re.split(r"[%_\\]", term), key=len)
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class _TextColumn:
+    """
+    Cột văn bản dạng dictionary-encoded: mỗi giá trị (đã bỏ dấu, lower) chỉ lưu một lần
+    và được intern, mỗi dòng giữ một mã int32. Inverted index n-gram trỏ tới các giá trị
+    nên LIKE chỉ cần kiểm tra các giá trị ứng viên, sau đó ánh xạ ngược về dòng.
+    """
+
+    def __init__(self, raw_values: List[Optional[str]]):
+        index: Dict[str, int] = {}
+        self.values: List[str] = []
+        self.codes = np.empty(len(raw_values), dtype=np.int32)
+
+        for row, value in enumerate(raw_values):
+            if value is None:
+                self.codes[row] = -1
+                continue
+            key = sys.intern(value)
+            code = index.get(key)
+            if code is None:
+                code = len(self.values)
+                index[key] = code
+                self.values.append(key)
+            self.codes[row] = code
+
+        postings: Dict[str, List[int]] = {}
+        for code, value in enumerate(self.values):
+            for gram in _ngrams(value):
+                postings.setdefault(gram, []).append(code)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def _candidates(self, literal: str) -> "np.ndarray":
+        if len(literal) < NGRAM_SIZE:
+            return np.arange(len(self.values), dtype=np.int32)
+
+        grams = sorted(_ngrams(literal), key=lambda g: len(self.postings.get(g, ())))
+        candidates = None
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return np.empty(0, dtype=np.int32)
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if not candidates.size:
+                break
+        return candidates
+
+    def match(self, term: str) -> "np.ndarray":
+        """
+        Mask theo dòng, tương đương <field>_search LIKE '%term%' (term đã chuẩn hóa).
+        """
+        if any(ch in term for ch in "%_\\"):
+            regex = _like_regex(term)
+            matched = [code for code in self._candidates(_longest_literal(term)) if regex.fullmatch(self.values[code])]
+        else:
+            matched = [code for code in self._candidates(term) if term in self.values[code]]
+
+        # Thêm một ô cuối luôn False để mã -1 (NULL) không bao giờ khớp
+        value_mask = np.zeros(len(self.values) + 1, dtype=bool)
+        value_mask[matched] = True
+        return value_mask[self.codes]
+
+
+class CatalogSnapshot:
+    """
+    Bản chụp bảng products dạng cột trong bộ nhớ, trả lời cùng tập tham số
+    với get_flexible_product_search và cho cùng kết quả với truy vấn SQL.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.size = len(rows)
+
+        self.columns: Dict[str, List[Any]] = {}
+        for column in PRODUCT_COLUMNS + list(DISPLAY_COLUMNS.values()):
+            values = [row[column] for row in rows]
+            if column not in ("id", "price", "original_price"):
+                values = [sys.intern(v) if isinstance(v, str) else v for v in values]
+            self.columns[column] = values
+
+        self.price = np.array([float(v) for v in self.columns["price"]], dtype=np.float64)
+        self.original_price = np.array([float(v) for v in self.columns["original_price"]], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Nhân trước rồi chia để giá trị phần trăm nguyên được biểu diễn chính xác
+            self.discount = (self.original_price - self.price) * 100 / self.original_price
+
+        # Dùng đúng giá trị của các cột <field>_search để khớp với đường SQL
+        self.text = {
+            field: _TextColumn([row[search_column(field)] for row in rows]) for field in SEARCH_FIELDS
+        }
+
+    def search(
+        self,
+        use_columns: List[str] = None,
+        name: List[str] = None,
+        price: float = 0,
+        capacity: List[str] = None,
+        color: List[str] = None,
+        policy: List[str] = None,
+        product_information: List[str] = None,
+        address: List[str] = None,
+        operator_flags: Dict[str, str] = None,
+        condition_groups: Dict[str, List[str]] = None,
+        group_operator: str = "AND",
+        price_range: List[float] = None,
+        discount_percent: List[float] = None,
+        sort_by: str = "",
+        limit: int = 0
+    ) -> List[Dict[str, Any]]:
+        condition_groups = condition_groups or {}
+        operator_flags = operator_flags or {}
+        filters = {
+            "name": name,
+            "capacity": capacity,
+            "color": color,
+            "policy": policy,
+            "product_information": product_information,
+            "address": address,
+        }
+
+        columns = use_columns or DEFAULT_COLUMNS
+        unknown = [column for column in columns if column not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown product columns: {unknown}")
+
+        def combine(masks: List["np.ndarray"], op: str) -> "np.ndarray":
+            if op == "AND":
+                return np.logical_and.reduce(masks)
+            return np.logical_or.reduce(masks)
+
+        def field_mask(field: str, items: List[str]) -> "np.ndarray":
+            op = normalize_operator(operator_flags.get(field), "OR")
+            return combine([self.text[field].match(normalize_search_text(item)) for item in items], op)
+
+        conditions = []
+
+        # Process condition groups
+        for group_name, group_fields in condition_groups.items():
+            field_masks = [field_mask(field, filters[field]) for field in group_fields if filters.get(field)]
+            if field_masks:
+                conditions.append(combine(field_masks, normalize_operator(operator_flags.get(group_name), "OR")))
+
+        # Process ungrouped conditions
+        used_fields = {field for fields in condition_groups.values() for field in fields}
+        for field, items in filters.items():
+            if items and field not in used_fields:
+                conditions.append(field_mask(field, items))
+
+        # Process price and discount conditions
+        if price_range and len(price_range) == 2:
+            conditions.append((self.price >= price_range[0]) & (self.price <= price_range[1]))
+
+        if discount_percent and len(discount_percent) == 2:
+            with np.errstate(invalid="ignore"):
+                conditions.append((self.discount >= discount_percent[0]) & (self.discount <= discount_percent[1]))
+
+        if conditions:
+            # Toán tử không hợp lệ bị từ chối giống build_flexible_product_query
+            mask = (
+                np.logical_or.reduce(conditions)
+                if normalize_operator(group_operator, "AND") == "OR"
+                else np.logical_and.reduce(conditions)
+            )
+            idx = np.flatnonzero(mask)
+        else:
+            idx = np.arange(self.size)
+
+        # Determine order and limit
+        if price and price > 0:
+            idx = idx[np.argsort(np.abs(self.price[idx] - price), kind="stable")][:10]
+        else:
+            if sort_by == "price_asc":
+                idx = idx[np.argsort(self.price[idx], kind="stable")]
+            elif sort_by == "price_desc":
+                idx = idx[np.argsort(-self.price[idx], kind="stable")]
+            if limit and limit > 0:
+                idx = idx[:limit]
+
+        sources = [(column, self.columns[DISPLAY_COLUMNS.get(column, column)]) for column in columns]
+        return [{column: values[i] for column, values in sources} for i in idx.tolist()]
+
+
+class CatalogEngine:
+    """
+    Engine tìm kiếm sản phẩm trong tiến trình. Nạp bảng products khi khởi động
+    và nạp lại khi phiên bản catalog thay đổi (kiểm tra định kỳ ở task nền).
+    """
+
+    def __init__(self, mode: str = CATALOG_ENGINE, refresh_interval: float = CATALOG_REFRESH_INTERVAL):
+        self.mode = mode
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.loads = 0
+        self.last_load_ms = 0.0
+        self.searches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "memory" and np is not None
+
+    def is_ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> Optional[int]:
+        """
+        Phiên bản catalog của snapshot đang dùng, có thể chậm hơn database tới refresh_interval.
+        """
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    async def load(self) -> None:
+        start = time.perf_counter()
+        version = await aget_catalog_version()
+        async with get_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                columns = (
+                    PRODUCT_COLUMNS
+                    + list(DISPLAY_COLUMNS.values())
+                    + [search_column(field) for field in SEARCH_FIELDS]
+                )
+                await cur.execute(f"SELECT {', '.join(columns)} FROM products ORDER BY id")
+                rows = await cur.fetchall()
+
+        # Việc dựng cấu trúc dữ liệu tốn CPU nên chạy ngoài event loop
+        self._snapshot = await asyncio.to_thread(CatalogSnapshot, rows, version)
+        self.loads += 1
+        self.last_load_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Catalog engine loaded {len(rows)} products (version {version}) in {self.last_load_ms:.1f} ms")
+
+    async def refresh_if_stale(self) -> bool:
+        version = await aget_catalog_version()
+        if self._snapshot is not None and self._snapshot.version == version:
+            return False
+        await self.load()
+        return True
+
+    async def start(self) -> None:
+        if self.mode == "memory" and np is None:
+            logger.warning("CATALOG_ENGINE=memory requires numpy; falling back to SQL search")
+        if not self.enabled or self._task is not None:
+            return
+        await self.load()
+        self._task = asyncio.create_task(self._refresh_loop(), name="catalog-engine-refresh")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_if_stale()
+            except Exception as e:
+                logger.error(f"Error refreshing catalog engine: {e}")
+
+    def search(self, **kwargs) -> List[Dict[str, Any]]:
+        self.searches += 1
+        return self._snapshot.search(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "mode": self.mode,
+            "enabled": self.enabled,
+            "ready": snapshot is not None,
+            "version": snapshot.version if snapshot else None,
+            "products": snapshot.size if snapshot else 0,
+            "loads": self.loads,
+            "last_load_ms": self.last_load_ms,
+            "searches": self.searches,
+        }
+
+
+catalog_engine = CatalogEngine()
@@ -0,0 +1,44 @@
+from .pool import get_pool
+
+
+def create_catalog_version_table(cur) -> None:
+    """
+    Bảng một dòng lưu phiên bản catalog sản phẩm, tăng mỗi khi dữ liệu sản phẩm thay đổi
+    để các cache trong tiến trình biết khi nào cần làm mới.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            version BIGINT NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING")
+
+
+def bump_catalog_version(cur) -> int:
+    """
+    Tăng phiên bản catalog trong cùng transaction với thay đổi dữ liệu sản phẩm.
+    """
+    cur.execute("""
+        UPDATE catalog_version
+        SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+        RETURNING version
+    """)
+    row = cur.fetchone()
+    return row["version"] if row else 0
+
+
+def get_catalog_version(cur) -> int:
+    cur.execute("SELECT version FROM catalog_version WHERE id = 1")
+    row = cur.fetchone()
+    return row["version"] if row else 0
+
+
+async def aget_catalog_version() -> int:
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT version FROM catalog_version WHERE id = 1")
+            row = await cur.fetchone()
+    return row["version"] if row else 0
@@ -2,7 +2,9 @@ import os
 from dotenv import load_dotenv, find_dotenv
 import psycopg
 from psycopg.rows import dict_row
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from .pool import get_pool
 
 load_dotenv(find_dotenv())
 
@@ -40,15 +42,22 @@ def create_chat_history_table():
                 )
             """)
 
-            # Create index on thread_id for faster queries
+            # Create index on (thread_id, created_at) for faster queries
             cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_message_thread_id ON chat_history (thread_id)
+                CREATE INDEX IF NOT EXISTS idx_chat_history_thread_created
+                ON chat_history (thread_id, created_at DESC, id DESC)
             """)
 
         
         conn.commit()
 
-def insert_chat_history(thread_id: str, question: str, answer: str):
+def insert_chat_history(
+    thread_id: str,
+    question: str,
+    answer: str,
+    question_tokens: Optional[int] = None,
+    answer_tokens: Optional[int] = None,
+):
     """
     Lưu lịch sử chat vào database
     
@@ -56,6 +65,8 @@ def insert_chat_history(thread_id: str, question: str, answer: str):
         thread_id (str): ID của cuộc trò chuyện
         question (str): Câu hỏi của người dùng
         answer (str): Câu trả lời của chatbot
+        question_tokens (int): Số token của câu hỏi
+        answer_tokens (int): Số token của câu trả lời
         
     Returns:
         Dict: Thông tin lịch sử chat vừa được lưu
@@ -63,9 +74,9 @@ def insert_chat_history(thread_id: str, question: str, answer: str):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
-                INSERT INTO chat_history (thread_id, question, answer) 
-                VALUES (%s, %s, %s) RETURNING id::text
-            """, (thread_id, question, answer))
+                INSERT INTO chat_history (thread_id, question, answer, question_tokens, answer_tokens) 
+                VALUES (%s, %s, %s, %s, %s) RETURNING id::text
+            """, (thread_id, question, answer, question_tokens, answer_tokens))
             result = cur.fetchone()
         conn.commit()
         return result['id']
@@ -74,15 +85,92 @@ def get_chat_history(thread_id: str, limit: int = 10) -> List[Dict[str, Any]]:
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
-                SELECT id::text, question, answer, created_at
+                SELECT id::text, question, answer, question_tokens, answer_tokens, created_at
                 FROM chat_history
                 WHERE thread_id = %s
-                ORDER BY created_at DESC
+                ORDER BY created_at DESC, id DESC
                 LIMIT %s
             """, (thread_id, limit))
             
             return cur.fetchall()
 
+async def ainsert_chat_history(
+    thread_id: str,
+    question: str,
+    answer: str,
+    question_tokens: Optional[int] = None,
+    answer_tokens: Optional[int] = None,
+) -> str:
+    """
+    Phiên bản async của insert_chat_history, dùng kết nối từ pool
+    """
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                INSERT INTO chat_history (thread_id, question, answer, question_tokens, answer_tokens) 
+                VALUES (%s, %s, %s, %s, %s) RETURNING id::text
+            """, (thread_id, question, answer, question_tokens, answer_tokens))
+            result = await cur.fetchone()
+        return result['id']
+
+async def aget_chat_history(thread_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Phiên bản async của get_chat_history, dùng kết nối từ pool
+    """
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT id::text, question, answer, question_tokens, answer_tokens, created_at
+                FROM chat_history
+                WHERE thread_id = %s
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            """, (thread_id, limit))
+            
+            return await cur.fetchall()
+
+async def aget_chat_history_page(
+    thread_id: str,
+    limit: int = 20,
+    before: Optional[Tuple[datetime, str]] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Lấy một trang lịch sử chat theo keyset (cursor), mới nhất trước.
+
+    Args:
+        thread_id (str): ID của cuộc trò chuyện
+        limit (int): Số lượt chat tối đa của trang
+        before (tuple): (created_at, id) của lượt chat cuối ở trang trước
+
+    Returns:
+        Tuple: (danh sách lượt chat, còn trang tiếp theo hay không)
+    """
+    if before is None:
+        query = """
+            SELECT id::text, question, answer, created_at
+            FROM chat_history
+            WHERE thread_id = %s
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        """
+        params = (thread_id, limit + 1)
+    else:
+        query = """
+            SELECT id::text, question, answer, created_at
+            FROM chat_history
+            WHERE thread_id = %s AND (created_at, id) < (%s, %s::uuid)
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        """
+        params = (thread_id, before[0], before[1], limit + 1)
+
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params)
+            rows = await cur.fetchall()
+
+    return rows[:limit], len(rows) > limit
+
 def format_chat_history(chat_history: List[Dict[str, Any]]) -> str:
     formatted_history = []
     
@@ -92,4 +180,41 @@ def format_chat_history(chat_history: List[Dict[str, Any]]) -> str:
             {"role": "assistant", "content": msg["answer"]}
         ])
     
-    return formatted_history
\ No newline at end of file
+    return formatted_history
+
+def select_history_within_budget(
+    chat_history: List[Dict[str, Any]],
+    token_budget: int,
+    used_tokens: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Chọn các tin nhắn gần nhất vừa với ngân sách token, dùng số token đã lưu
+    của từng lượt chat nên không cần tokenize lại khi xử lý request.
+
+    Args:
+        chat_history: Các lượt chat, mới nhất trước (như get_chat_history trả về)
+        token_budget: Tổng số token tối đa
+        used_tokens: Số token đã dùng (ví dụ câu hỏi hiện tại)
+
+    Returns:
+        Danh sách tin nhắn theo thứ tự thời gian, cùng định dạng với format_chat_history
+    """
+    selected = []
+    total_tokens = used_tokens
+
+    # Duyệt từ tin nhắn mới nhất đến cũ nhất, dừng khi vượt ngân sách
+    for msg in chat_history:
+        for role, content, tokens in (
+            ("assistant", msg["answer"], msg.get("answer_tokens")),
+            ("human", msg["question"], msg.get("question_tokens")),
+        ):
+            # Dòng cũ chưa backfill: ước lượng ~4 ký tự/token thay vì tokenize
+            tokens = tokens if tokens is not None else len(content) // 4
+            if total_tokens + tokens > token_budget:
+                selected.reverse()
+                return selected
+            selected.append({"role": role, "content": content})
+            total_tokens += tokens
+
+    selected.reverse()
+    return selected
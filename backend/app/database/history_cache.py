@@ -0,0 +1,208 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv, find_dotenv
+from typing import List, Dict, Any, Optional
+from .chat_history_service import aget_chat_history, format_chat_history
+from .history_writer import history_writer
+from app.core.metrics import timed_stage
+
+load_dotenv(find_dotenv())
+
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "10"))
+CHAT_HISTORY_CACHE_MAX_THREADS = int(os.getenv("CHAT_HISTORY_CACHE_MAX_THREADS", "5000"))
+CHAT_HISTORY_CACHE_MAX_BYTES = int(os.getenv("CHAT_HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CHAT_HISTORY_CACHE_TTL = float(os.getenv("CHAT_HISTORY_CACHE_TTL", "1800"))
+
+
+class _Entry:
+    __slots__ = ("turns", "size", "expires_at")
+
+    def __init__(self, turns: List[Dict[str, Any]], size: int, expires_at: float):
+        self.turns = turns
+        self.size = size
+        self.expires_at = expires_at
+
+
+def _turns_size(turns: List[Dict[str, Any]]) -> int:
+    # Ước lượng bộ nhớ theo độ dài nội dung (UTF-8 tối đa 4 byte/ký tự nhưng tiếng Việt ~2)
+    return sum(2 * (len(turn["question"]) + len(turn["answer"])) + 128 for turn in turns)
+
+
+class ChatHistoryCache:
+    """
+    Cache LRU trong tiến trình cho cửa sổ các lượt chat gần nhất của từng thread
+    (mới nhất trước, kèm số token đã lưu).
+
+    Giới hạn theo số thread và tổng bộ nhớ ước lượng; mỗi entry hết hạn sau TTL.
+    Mỗi worker có cache riêng, nên TTL cũng là giới hạn độ trễ khi một thread
+    được phục vụ bởi nhiều worker.
+    """
+
+    def __init__(
+        self,
+        window: int = CHAT_HISTORY_WINDOW,
+        max_threads: int = CHAT_HISTORY_CACHE_MAX_THREADS,
+        max_bytes: int = CHAT_HISTORY_CACHE_MAX_BYTES,
+        ttl: float = CHAT_HISTORY_CACHE_TTL,
+    ):
+        self.window = window
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, thread_id: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(thread_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at < time.monotonic():
+            self._remove(thread_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(thread_id)
+        self.hits += 1
+        return list(entry.turns)
+
+    def put(self, thread_id: str, turns: List[Dict[str, Any]]) -> None:
+        """
+        Lưu cửa sổ lịch sử lấy từ database. Không ghi đè entry đã có
+        vì entry đó có thể đã được cập nhật bởi một lượt chat mới hơn.
+        """
+        if thread_id in self._entries:
+            return
+        self._set(thread_id, turns[:self.window])
+
+    def append_turn(self, thread_id: str, turn: Dict[str, Any]) -> None:
+        """
+        Cập nhật tại chỗ khi một lượt chat được lưu. Chỉ cập nhật thread đang có trong cache.
+        """
+        entry = self._entries.get(thread_id)
+        if entry is None:
+            return
+
+        turns = [turn] + entry.turns
+        self._remove(thread_id)
+        self._set(thread_id, turns[:self.window])
+
+    def invalidate(self, thread_id: str) -> None:
+        self._remove(thread_id)
+
+    def _set(self, thread_id: str, turns: List[Dict[str, Any]]) -> None:
+        size = _turns_size(turns)
+        if size > self.max_bytes:
+            return
+
+        self._entries[thread_id] = _Entry(turns, size, time.monotonic() + self.ttl)
+        self._bytes += size
+
+        while len(self._entries) > self.max_threads or self._bytes > self.max_bytes:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, thread_id: str) -> None:
+        entry = self._entries.pop(thread_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "threads": len(self._entries),
+            "max_threads": self.max_threads,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "window": self.window,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+history_cache = ChatHistoryCache()
+
+
+@timed_stage("history_fetch")
+async def aget_recent_chat_turns(thread_id: str, limit: int = CHAT_HISTORY_WINDOW) -> List[Dict[str, Any]]:
+    """
+    Lấy các lượt chat gần nhất của thread (mới nhất trước), ưu tiên cache
+    và quay về database khi miss.
+    """
+    if limit > history_cache.window:
+        return await _aget_chat_history_with_pending(thread_id, limit)
+
+    turns = history_cache.get(thread_id)
+    if turns is None:
+        turns = await _aget_chat_history_with_pending(thread_id, history_cache.window)
+        history_cache.put(thread_id, turns)
+
+    return turns[:limit]
+
+
+async def _aget_chat_history_with_pending(thread_id: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Đọc lịch sử từ database và bổ sung các lượt chat của thread còn trong hàng đợi ghi,
+    để cửa sổ được cache không thiếu lượt mới nhất.
+    """
+    # Lấy pending cả trước và sau khi đọc: lượt được ghi xong trong lúc đọc vẫn nằm ở một trong hai
+    pending = history_writer.pending_turns(thread_id)
+    turns = await aget_chat_history(thread_id=thread_id, limit=limit)
+    pending = history_writer.pending_turns(thread_id) + pending
+    if not pending:
+        return turns
+
+    seen = {turn["id"] for turn in turns}
+    merged = []
+    for turn in pending:
+        if turn["id"] not in seen:
+            seen.add(turn["id"])
+            merged.append(turn)
+    return (merged + turns)[:limit]
+
+
+async def aget_recent_chat_history(thread_id: str, limit: int = CHAT_HISTORY_WINDOW) -> List[Dict[str, Any]]:
+    """
+    Lấy lịch sử chat đã format của thread.
+    """
+    return format_chat_history(await aget_recent_chat_turns(thread_id, limit))
+
+
+@timed_stage("history_save")
+async def asave_chat_turn(
+    thread_id: str,
+    question: str,
+    answer: str,
+    question_tokens: Optional[int] = None,
+    answer_tokens: Optional[int] = None,
+) -> None:
+    """
+    Lưu một lượt chat: cập nhật cache ngay và đưa vào hàng đợi ghi database.
+    """
+    history_cache.append_turn(thread_id, {
+        "question": question,
+        "answer": answer,
+        "question_tokens": question_tokens,
+        "answer_tokens": answer_tokens,
+    })
+    try:
+        await history_writer.submit(thread_id, question, answer, question_tokens, answer_tokens)
+    except asyncio.CancelledError:
+        # Lượt chat không được ghi: bỏ cửa sổ đã cache (có thể chứa lượt này), lần đọc sau lấy lại từ database
+        history_cache.invalidate(thread_id)
+        raise
@@ -0,0 +1,251 @@
+import os
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from dotenv import load_dotenv, find_dotenv
+from typing import List, Dict, Any, Optional, Tuple
+from .pool import get_pool
+from app.core.metrics import timed_stage
+
+load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_BATCH_SIZE = int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "100"))
+CHAT_HISTORY_FLUSH_INTERVAL = float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "0.5"))
+CHAT_HISTORY_QUEUE_SIZE = int(os.getenv("CHAT_HISTORY_QUEUE_SIZE", "2000"))
+CHAT_HISTORY_FLUSH_RETRIES = int(os.getenv("CHAT_HISTORY_FLUSH_RETRIES", "3"))
+
+_STOP = object()
+
+# (id, thread_id, question, answer, question_tokens, answer_tokens, created_at)
+Turn = Tuple[str, str, str, str, Optional[int], Optional[int], datetime]
+
+
+class ChatHistoryWriter:
+    """
+    Ghi lịch sử chat theo kiểu write-behind: các lượt chat được đưa vào hàng đợi
+    và một task nền ghi chúng theo lô bằng COPY khi đủ số lượng hoặc hết thời gian chờ.
+
+    Hàng đợi có giới hạn nên khi database chậm, submit() sẽ phải chờ (backpressure)
+    thay vì để bộ nhớ tăng không giới hạn.
+
+    Các lượt chat chưa được ghi xong được giữ theo thread (pending_turns) để người đọc
+    lịch sử từ database có thể bổ sung; id được tạo trước nên trùng lặp được loại bỏ theo id.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = CHAT_HISTORY_BATCH_SIZE,
+        flush_interval: float = CHAT_HISTORY_FLUSH_INTERVAL,
+        max_queue_size: int = CHAT_HISTORY_QUEUE_SIZE,
+        max_retries: int = CHAT_HISTORY_FLUSH_RETRIES,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = True
+        # Số submit() đang chờ chỗ trống trong hàng đợi
+        self._waiting_puts = 0
+        # Lượt chat đã submit nhưng chưa ghi xong, theo thread (cũ nhất trước)
+        self._pending: Dict[str, List[Turn]] = {}
+
+        self._submitted = 0
+        self._flushed_rows = 0
+        self._flushed_batches = 0
+        self._dropped_rows = 0
+        self._flush_errors = 0
+        self._backpressure_waits = 0
+        self._last_flush_ms = 0.0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="chat-history-writer")
+
+    async def stop(self) -> None:
+        """
+        Dừng task nền sau khi đã ghi hết các lượt chat còn trong hàng đợi.
+        """
+        if self._task is None:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        await self._task
+
+        # submit() đang chờ vì hàng đợi đầy có thể đưa lượt chat vào sau _STOP:
+        # ghi nốt cho đến khi không còn submit nào đang chờ
+        while self._waiting_puts or not self._queue.empty():
+            remaining_items = self._drain()
+            if not remaining_items:
+                await asyncio.sleep(0)
+            for i in range(0, len(remaining_items), self.batch_size):
+                await self._flush_with_retry(remaining_items[i:i + self.batch_size])
+
+        self._task = None
+        self._queue = None
+
+    async def submit(
+        self,
+        thread_id: str,
+        question: str,
+        answer: str,
+        question_tokens: Optional[int] = None,
+        answer_tokens: Optional[int] = None,
+    ) -> None:
+        """
+        Đưa một lượt chat vào hàng đợi. Chờ nếu hàng đợi đầy.
+        """
+        # Giờ UTC có timezone; khi ghi được đổi sang timezone của session như CURRENT_TIMESTAMP
+        turn = (str(uuid.uuid4()), thread_id, question, answer, question_tokens, answer_tokens, datetime.now(timezone.utc))
+
+        if self._closed:
+            # Writer chưa chạy hoặc đang tắt: ghi trực tiếp
+            await self._flush([turn])
+            return
+
+        # Thấy được ngay trong history cache kể cả khi đang chờ hàng đợi đầy
+        self._pending.setdefault(thread_id, []).append(turn)
+        if self._queue.full():
+            self._backpressure_waits += 1
+        self._waiting_puts += 1
+        try:
+            await self._queue.put(turn)
+        except asyncio.CancelledError:
+            # Bị hủy khi đang chờ (client ngắt kết nối): lượt chat không vào hàng đợi nên sẽ không
+            # bao giờ được ghi, không để nó nằm lại trong _pending
+            self._done([turn])
+            raise
+        finally:
+            self._waiting_puts -= 1
+        self._submitted += 1
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch: List[Turn] = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Gom thêm cho đến khi đủ lô hoặc hết thời gian chờ
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush_with_retry(batch)
+
+        # Ghi nốt những gì còn lại trong hàng đợi
+        remaining_items = self._drain()
+        for i in range(0, len(remaining_items), self.batch_size):
+            await self._flush_with_retry(remaining_items[i:i + self.batch_size])
+
+    def pending_turns(self, thread_id: str) -> List[Dict[str, Any]]:
+        """
+        Các lượt chat của thread đang chờ ghi, mới nhất trước, cùng dạng với dòng đọc từ database.
+        """
+        return [
+            {
+                "id": turn[0],
+                "question": turn[2],
+                "answer": turn[3],
+                "question_tokens": turn[4],
+                "answer_tokens": turn[5],
+                "created_at": turn[6],
+            }
+            for turn in reversed(self._pending.get(thread_id, ()))
+        ]
+
+    def _done(self, batch: List[Turn]) -> None:
+        for turn in batch:
+            turns = self._pending.get(turn[1])
+            if turns is None:
+                continue
+            try:
+                turns.remove(turn)
+            except ValueError:
+                pass
+            if not turns:
+                del self._pending[turn[1]]
+
+    def _drain(self) -> List[Turn]:
+        items: List[Turn] = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                items.append(item)
+        return items
+
+    async def _flush_with_retry(self, batch: List[Turn]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._flush(batch)
+                self._done(batch)
+                return
+            except Exception as e:
+                self._flush_errors += 1
+                logger.error(f"Error flushing chat history batch (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(2 ** attempt * 0.5, 5))
+
+        self._done(batch)
+        self._dropped_rows += len(batch)
+        logger.error(f"Dropped {len(batch)} chat history rows after {self.max_retries + 1} attempts")
+
+    @timed_stage("history_flush")
+    async def _flush(self, batch: List[Turn]) -> None:
+        start = time.perf_counter()
+        async with get_pool().connection() as conn:
+            # created_at là TIMESTAMP không timezone, mặc định CURRENT_TIMESTAMP theo giờ của session:
+            # ghi cùng quy ước để lượt chat cũ và mới sắp xếp nhất quán
+            session_tz = conn.info.timezone
+            async with conn.cursor() as cur:
+                async with cur.copy(
+                    "COPY chat_history (id, thread_id, question, answer, question_tokens, answer_tokens, created_at) FROM STDIN"
+                ) as copy:
+                    for turn in batch:
+                        await copy.write_row(turn[:6] + (turn[6].astimezone(session_tz).replace(tzinfo=None),))
+
+        self._last_flush_ms = (time.perf_counter() - start) * 1000
+        self._flushed_rows += len(batch)
+        self._flushed_batches += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending_threads": len(self._pending),
+            "queue_capacity": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "submitted": self._submitted,
+            "flushed_rows": self._flushed_rows,
+            "flushed_batches": self._flushed_batches,
+            "avg_batch_size": (self._flushed_rows / self._flushed_batches) if self._flushed_batches else 0.0,
+            "last_flush_ms": self._last_flush_ms,
+            "flush_errors": self._flush_errors,
+            "dropped_rows": self._dropped_rows,
+            "backpressure_waits": self._backpressure_waits,
+        }
+
+
+history_writer = ChatHistoryWriter()
@@ -0,0 +1,117 @@
+"""
+Manifest ảnh sản phẩm: danh sách các đường dẫn ảnh (tương đối với thư mục product_images)
+có trong kho ảnh, được tạo offline và nạp một lần để kiểm tra ảnh tồn tại mà không cần gọi mạng.
+
+    # Từ bản checkout cục bộ của kho ảnh
+    python -m app.database.image_manifest --from-dir ../share-host-files/product_images
+
+    # Từ GitHub tree API
+    python -m app.database.image_manifest --from-github Dat-ABC/share-host-files --ref main --prefix product_images
+"""
+import os
+import json
+import logging
+import argparse
+from datetime import datetime
+from functools import lru_cache
+from dotenv import load_dotenv, find_dotenv
+from typing import Iterable, FrozenSet, Optional
+
+load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MANIFEST_PATH = os.getenv(
+    "IMAGE_MANIFEST_PATH",
+    os.path.join(os.path.dirname(__file__), "image_manifest.json"),
+)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+@lru_cache(maxsize=1)
+def load_image_manifest() -> Optional[FrozenSet[str]]:
+    """
+    Nạp manifest một lần. Trả về None nếu chưa có file manifest.
+    """
+    try:
+        with open(IMAGE_MANIFEST_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Image manifest not found at {IMAGE_MANIFEST_PATH}; image availability is not checked")
+        return None
+    return frozenset(data["paths"])
+
+
+def image_exists(path: str) -> bool:
+    """
+    Kiểm tra O(1) một đường dẫn ảnh tương đối có trong manifest không.
+    Khi chưa có manifest thì coi như ảnh tồn tại.
+    """
+    manifest = load_image_manifest()
+    return manifest is None or path in manifest
+
+
+def collect_from_dir(root: str) -> Iterable[str]:
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, "/")
+
+
+def collect_from_github(repo: str, ref: str, prefix: str) -> Iterable[str]:
+    import requests
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if os.getenv("GITHUB_TOKEN"):
+        headers["Authorization"] = f"Bearer {os.getenv('GITHUB_TOKEN')}"
+
+    response = requests.get(
+        f"https://api.github.com/repos/{repo}/git/trees/{ref}",
+        params={"recursive": "1"},
+        headers=headers,
+        timeout=60,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if data.get("truncated"):
+        logger.warning("GitHub tree response was truncated; the manifest may be incomplete")
+
+    base = prefix.strip("/") + "/"
+    for item in data["tree"]:
+        path = item["path"]
+        if item["type"] == "blob" and path.startswith(base) and path.lower().endswith(IMAGE_EXTENSIONS):
+            yield path[len(base):]
+
+
+def write_image_manifest(paths: Iterable[str], source: str, output: str = IMAGE_MANIFEST_PATH) -> int:
+    paths = sorted(set(paths))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {"generated_at": datetime.now().isoformat(), "source": source, "paths": paths},
+            f,
+            ensure_ascii=False,
+            indent=0,
+        )
+    load_image_manifest.cache_clear()
+    return len(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate the product image manifest")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-dir", help="Local product_images directory")
+    source.add_argument("--from-github", metavar="OWNER/REPO", help="GitHub repository holding the images")
+    parser.add_argument("--ref", default="main", help="Branch or commit for --from-github")
+    parser.add_argument("--prefix", default="product_images", help="Image directory inside the repository")
+    parser.add_argument("--output", default=IMAGE_MANIFEST_PATH)
+    args = parser.parse_args()
+
+    if args.from_dir:
+        count = write_image_manifest(collect_from_dir(args.from_dir), f"dir:{args.from_dir}", args.output)
+    else:
+        count = write_image_manifest(
+            collect_from_github(args.from_github, args.ref, args.prefix),
+            f"github:{args.from_github}@{args.ref}/{args.prefix}",
+            args.output,
+        )
+    print(f"Wrote {count} image paths to {args.output}")
@@ -0,0 +1,144 @@
+"""
+Migration schema đơn giản: mỗi migration là một hàm nhận cursor, chạy theo thứ tự
+và được ghi lại trong bảng schema_migrations để không chạy lại.
+
+    python -m app.database.migrations
+"""
+from typing import Callable, List, Tuple
+from .chat_history_service import get_connection, create_chat_history_table
+from .product_service import (
+    create_product_table,
+    refresh_product_search_columns,
+    refresh_product_display_columns,
+    PRODUCT_DISPLAY_FIELDS,
+)
+from .search_text import SEARCH_FIELDS, search_column
+from .catalog_version import create_catalog_version_table
+
+
+def _add_chat_history_token_counts(cur) -> None:
+    cur.execute("""
+        ALTER TABLE chat_history
+            ADD COLUMN IF NOT EXISTS question_tokens INTEGER,
+            ADD COLUMN IF NOT EXISTS answer_tokens INTEGER
+    """)
+
+    # Backfill các dòng cũ, dùng cùng encoding với app.core.ai.tokens
+    enc = None
+
+    while True:
+        cur.execute("""
+            SELECT id, question, answer FROM chat_history
+            WHERE question_tokens IS NULL OR answer_tokens IS NULL
+            LIMIT 1000
+        """)
+        rows = cur.fetchall()
+        if not rows:
+            break
+        if enc is None:
+            import tiktoken
+            enc = tiktoken.get_encoding("o200k_base")
+        cur.executemany(
+            "UPDATE chat_history SET question_tokens = %s, answer_tokens = %s WHERE id = %s",
+            [(len(enc.encode(row["question"])), len(enc.encode(row["answer"])), row["id"]) for row in rows],
+        )
+
+
+def _add_chat_history_thread_created_index(cur) -> None:
+    # Index (thread_id, created_at DESC) cho phép đọc lịch sử và phân trang
+    # theo cursor bằng index range scan, không cần sort
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chat_history_thread_created
+        ON chat_history (thread_id, created_at DESC, id DESC)
+    """)
+    # Index cũ chỉ trên thread_id là tiền tố của index mới nên không còn cần
+    cur.execute("DROP INDEX IF EXISTS idx_message_thread_id")
+
+
+def _add_product_trigram_indexes(cur) -> None:
+    # GIN trigram trên LOWER(field) để các điều kiện LOWER(field) LIKE '%x%'
+    # (kể cả LIKE ANY (ARRAY[...])) dùng được bitmap index scan thay vì seq scan
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for field in SEARCH_FIELDS:
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_products_{field}_trgm
+            ON products USING gin (LOWER({field}) gin_trgm_ops)
+        """)
+    cur.execute("ANALYZE products")
+
+
+def _add_product_search_columns(cur) -> None:
+    # Cột bóng <field>_search đã bỏ dấu và lower, được tính sẵn khi seed/cập nhật
+    # để truy vấn không phải gọi LOWER() trên từng dòng và khớp "dien thoai" với "điện thoại"
+    cur.execute(
+        "ALTER TABLE products "
+        + ", ".join(f"ADD COLUMN IF NOT EXISTS {search_column(field)} TEXT" for field in SEARCH_FIELDS)
+    )
+    refresh_product_search_columns(cur)
+
+    # Thay index trigram trên LOWER(field) bằng index trên cột bóng
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for field in SEARCH_FIELDS:
+        cur.execute(f"DROP INDEX IF EXISTS idx_products_{field}_trgm")
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_products_{field}_search_trgm
+            ON products USING gin ({search_column(field)} gin_trgm_ops)
+        """)
+    cur.execute("ANALYZE products")
+
+
+def _add_product_display_columns(cur) -> None:
+    # Giá đã format, dung lượng đã lọc và URL ảnh được tính một lần thay vì ở mỗi truy vấn
+    cur.execute(
+        "ALTER TABLE products "
+        + ", ".join(f"ADD COLUMN IF NOT EXISTS {field} TEXT" for field in PRODUCT_DISPLAY_FIELDS)
+    )
+    refresh_product_display_columns(cur)
+
+
+MIGRATIONS: List[Tuple[str, Callable]] = [
+    ("0001_chat_history_token_counts", _add_chat_history_token_counts),
+    ("0002_chat_history_thread_created_index", _add_chat_history_thread_created_index),
+    ("0003_product_trigram_indexes", _add_product_trigram_indexes),
+    ("0004_catalog_version", create_catalog_version_table),
+    ("0005_product_search_columns", _add_product_search_columns),
+    ("0006_product_display_columns", _add_product_display_columns),
+]
+
+
+def run_migrations() -> List[str]:
+    """
+    Chạy các migration chưa được áp dụng, trả về danh sách migration vừa chạy.
+    """
+    create_product_table()
+    create_chat_history_table()
+
+    applied_now = []
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version VARCHAR(255) PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Tránh hai tiến trình cùng chạy migration
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+            cur.execute("SELECT version FROM schema_migrations")
+            applied = {row["version"] for row in cur.fetchall()}
+
+            for version, migration in MIGRATIONS:
+                if version in applied:
+                    continue
+                migration(cur)
+                cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                applied_now.append(version)
+
+        conn.commit()
+
+    return applied_now
+
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    print(f"Applied migrations: {applied}" if applied else "Database schema is up to date.")
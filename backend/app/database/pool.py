@@ -0,0 +1,102 @@
+import os
+from dotenv import load_dotenv, find_dotenv
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from typing import Optional, Dict, Any
+
+load_dotenv(find_dotenv())
+
+DB_NAME = os.getenv("DB_NAME")
+DB_USERNAME = os.getenv("DB_USERNAME")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+
+# Kích thước và cấu hình kiểm tra sức khỏe của pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_CHECK = os.getenv("DB_POOL_CHECK", "true").lower() in ("1", "true", "yes")
+
+_pool: Optional[AsyncConnectionPool] = None
+
+
+def _conninfo() -> str:
+    return make_conninfo(
+        dbname=DB_NAME,
+        user=DB_USERNAME,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+    )
+
+
+async def open_pool() -> AsyncConnectionPool:
+    """
+    Khởi tạo pool kết nối dùng chung, gọi một lần trong lifespan của ứng dụng.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    _pool = AsyncConnectionPool(
+        conninfo=_conninfo(),
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        # Kiểm tra kết nối trước khi giao cho request để loại bỏ kết nối chết
+        check=AsyncConnectionPool.check_connection if DB_POOL_CHECK else None,
+        kwargs={"row_factory": dict_row},
+        name="chatbot",
+        open=False,
+    )
+    await _pool.open(wait=True)
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> AsyncConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Database pool is not open. Call open_pool() first.")
+    return _pool
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Thống kê pool: số lần checkout, thời gian chờ, số kết nối đang dùng.
+    """
+    if _pool is None:
+        return {"open": False}
+
+    stats = _pool.get_stats()
+    requests_num = stats.get("requests_num", 0)
+    requests_wait_ms = stats.get("requests_wait_ms", 0)
+
+    return {
+        "open": True,
+        "min_size": _pool.min_size,
+        "max_size": _pool.max_size,
+        "pool_size": stats.get("pool_size", 0),
+        "pool_available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+        "checkouts": requests_num,
+        "checkouts_queued": stats.get("requests_queued", 0),
+        "checkout_errors": stats.get("requests_errors", 0),
+        "wait_ms_total": requests_wait_ms,
+        "wait_ms_avg": (requests_wait_ms / requests_num) if requests_num else 0.0,
+        "usage_ms_total": stats.get("usage_ms", 0),
+        "connections_num": stats.get("connections_num", 0),
+        "connections_errors": stats.get("connections_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+    }
@@ -0,0 +1,224 @@
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv, find_dotenv
+from typing import List, Dict, Any, Optional, Tuple
+from .search_text import SEARCH_FIELDS, normalize_search_text, normalize_operator
+
+load_dotenv(find_dotenv())
+
+PRODUCT_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("PRODUCT_SEARCH_CACHE_MAX_ENTRIES", "2000"))
+PRODUCT_SEARCH_CACHE_MAX_BYTES = int(os.getenv("PRODUCT_SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Khoảng thời gian tối đa dùng lại phiên bản catalog đã đọc trước khi hỏi lại database
+PRODUCT_SEARCH_CACHE_VERSION_TTL = float(os.getenv("PRODUCT_SEARCH_CACHE_VERSION_TTL", "1"))
+
+
+def canonical_search_key(
+    use_columns: List[str] = None,
+    name: List[str] = None,
+    price: float = 0,
+    capacity: List[str] = None,
+    color: List[str] = None,
+    policy: List[str] = None,
+    product_information: List[str] = None,
+    address: List[str] = None,
+    operator_flags: Dict[str, str] = None,
+    condition_groups: Dict[str, List[str]] = None,
+    group_operator: str = "AND",
+    price_range: List[float] = None,
+    discount_percent: List[float] = None,
+    sort_by: str = "",
+    limit: int = 0
+) -> Tuple:
+    """
+    Dạng chuẩn của tham số flexible_product_search: các tham số cho cùng kết quả
+    (danh sách đảo thứ tự, khác hoa thường/dấu, toán tử viết khác) cho cùng một key.
+    """
+    filters = {
+        "name": name,
+        "capacity": capacity,
+        "color": color,
+        "policy": policy,
+        "product_information": product_information,
+        "address": address,
+    }
+    # Toán tử chuẩn hóa giống hệt build_flexible_product_query để key khớp với câu SQL thực chạy
+    operator_flags = operator_flags or {}
+
+    def field_op(key: str) -> str:
+        return normalize_operator(operator_flags.get(key), "OR")
+
+    # Từ khóa được so khớp sau khi chuẩn hóa nên chỉ cần giữ dạng đã chuẩn hóa
+    terms = {
+        field: tuple(sorted({normalize_search_text(item) for item in items}))
+        for field, items in filters.items() if items
+    }
+
+    groups = []
+    ungrouped = []
+    used_fields = set()
+    for group_name, group_fields in (condition_groups or {}).items():
+        used_fields.update(group_fields)
+        members = tuple(sorted(
+            (field, field_op(field), terms[field]) for field in set(group_fields) if field in terms
+        ))
+        if len(members) > 1:
+            groups.append((field_op(group_name), members))
+        elif members:
+            # Nhóm chỉ có một trường tương đương với điều kiện không nhóm
+            ungrouped.extend(members)
+
+    ungrouped.extend(
+        (field, field_op(field), terms[field]) for field in SEARCH_FIELDS
+        if field in terms and field not in used_fields
+    )
+
+    if price and price > 0:
+        order = ("price", float(price))
+    else:
+        order = (
+            sort_by if sort_by in ("price_asc", "price_desc") else "",
+            int(limit) if limit and limit > 0 else 0,
+        )
+
+    return (
+        tuple(use_columns) if use_columns else None,
+        tuple(sorted(groups)),
+        tuple(sorted(ungrouped)),
+        tuple(float(v) for v in price_range) if price_range and len(price_range) == 2 else None,
+        tuple(float(v) for v in discount_percent) if discount_percent and len(discount_percent) == 2 else None,
+        normalize_operator(group_operator, "AND"),
+        order,
+    )
+
+
+def _rows_size(rows: List[Dict[str, Any]]) -> int:
+    return sum(sum(len(str(value)) for value in row.values()) * 2 + 64 * len(row) for row in rows) + 256
+
+
+class _Entry:
+    __slots__ = ("rows", "size", "version", "compute_ms")
+
+    def __init__(self, rows: List[Dict[str, Any]], size: int, version: int, compute_ms: float):
+        self.rows = rows
+        self.size = size
+        self.version = version
+        self.compute_ms = compute_ms
+
+
+class ProductSearchCache:
+    """
+    Cache LRU kết quả flexible_product_search (đã format) theo key chuẩn hóa của tham số.
+
+    Mỗi entry gắn phiên bản catalog lúc tính; khi phiên bản thay đổi (seed, update_product)
+    toàn bộ cache bị bỏ. Giới hạn theo số entry và tổng bộ nhớ ước lượng.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PRODUCT_SEARCH_CACHE_MAX_ENTRIES,
+        max_bytes: int = PRODUCT_SEARCH_CACHE_MAX_BYTES,
+        version_ttl: float = PRODUCT_SEARCH_CACHE_VERSION_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_ttl = version_ttl
+
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def version_is_fresh(self) -> bool:
+        return self._version is not None and time.monotonic() - self._version_checked_at < self.version_ttl
+
+    def set_version(self, version: int) -> None:
+        """
+        Ghi nhận phiên bản catalog vừa đọc; bỏ toàn bộ cache nếu phiên bản đã đổi.
+        """
+        if self._version is not None and version != self._version:
+            self.clear()
+            self.invalidations += 1
+        self._version = version
+        self._version_checked_at = time.monotonic()
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        start = time.perf_counter()
+        entry = self._entries.get(key)
+        if entry is None or entry.version != self._version:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # Trả bản sao để người gọi có thể sửa kết quả mà không ảnh hưởng cache
+        rows = [dict(row) for row in entry.rows]
+        self.saved_ms += max(0.0, entry.compute_ms - (time.perf_counter() - start) * 1000)
+        return rows
+
+    def put(self, key: Tuple, rows: List[Dict[str, Any]], compute_ms: float, version: Optional[int] = None) -> None:
+        """
+        Lưu kết quả; version là phiên bản catalog lúc bắt đầu tính. Nếu phiên bản đã đổi
+        trong lúc tính thì kết quả có thể đã cũ và không được lưu.
+        """
+        if not self.enabled or self._version is None:
+            return
+        if version is not None and version != self._version:
+            return
+
+        size = _rows_size(rows)
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        self._entries[key] = _Entry([dict(row) for row in rows], size, self._version, compute_ms)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "catalog_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "saved_ms": self.saved_ms,
+            "avg_saved_ms": (self.saved_ms / self.hits) if self.hits else 0.0,
+        }
+
+
+product_search_cache = ProductSearchCache()
@@ -1,10 +1,17 @@
 from pickle import DICT
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from .chat_history_service import get_connection
+from .pool import get_pool
+from .catalog_engine import catalog_engine, PRODUCT_COLUMNS, DISPLAY_COLUMNS
+from .catalog_version import bump_catalog_version, get_catalog_version, aget_catalog_version
+from .product_search_cache import product_search_cache, canonical_search_key
+from .search_text import SEARCH_FIELDS, search_column, normalize_search_text, normalize_operator
+from .image_manifest import image_exists
+from app.core.metrics import timed_stage
 from decimal import Decimal
 import re
 import unicodedata
-import requests
+import time
 
 def create_product_table():
     """
@@ -54,27 +61,119 @@ def slugify(name: str) -> str:
     slug = re.sub(r'[-\s]+', '_', cleaned).strip('_')
     return slug
 
+IMAGE_BASE_URL = "https://raw.githubusercontent.com/Dat-ABC/share-host-files/main/product_images"
+CAPACITY_UNITS = ['MB', 'GB', 'TB']
+
+def compute_display_fields(product: Dict) -> Dict[str, Optional[str]]:
+    """
+    Compute the display values of a product once, at seed or update time.
+    """
+    capacity = product['capacity']
+    image_url = product['image_url']
+    color = (product['color'] or '').strip().split(",")[0]
+
+    return {
+        'price_display': format_currency_vn(product['price']),
+        'original_price_display': format_currency_vn(product['original_price']),
+        # NULL when the capacity has no unit, so the field is hidden from results
+        'capacity_display': capacity if not capacity or any(unit in capacity for unit in CAPACITY_UNITS) else None,
+        'image_url_display': (
+            f"{IMAGE_BASE_URL}/{image_url.split(',')[0]}?raw=true".replace(" ", "%20") if image_url else image_url
+        ),
+        # Image of the first color, used by the single-product lookups
+        'color_image_url': (
+            f"{IMAGE_BASE_URL}/{image_url}/{slugify(color)}/{color}.png?raw=true".replace(" ", "%20") if image_url else None
+        ),
+    }
+
+PRODUCT_DISPLAY_FIELDS = [
+    'price_display', 'original_price_display', 'capacity_display', 'image_url_display', 'color_image_url',
+]
+
+def refresh_product_display_columns(cursor, product_ids: Optional[List[int]] = None) -> int:
+    """
+    Populate the precomputed display columns from the source fields.
+    Refreshes every product when product_ids is None.
+    """
+    columns = "id, price, original_price, capacity, image_url, color"
+    if product_ids is None:
+        cursor.execute(f"SELECT {columns} FROM products")
+    else:
+        cursor.execute(f"SELECT {columns} FROM products WHERE id = ANY(%s)", (list(product_ids),))
+    rows = cursor.fetchall()
+
+    assignments = ", ".join(f"{field} = %s" for field in PRODUCT_DISPLAY_FIELDS)
+    params = []
+    for row in rows:
+        display = compute_display_fields(row)
+        params.append(tuple(display[field] for field in PRODUCT_DISPLAY_FIELDS) + (row['id'],))
+    cursor.executemany(f"UPDATE products SET {assignments} WHERE id = %s", params)
+    return len(rows)
+
+def refresh_product_search_columns(cursor, product_ids: Optional[List[int]] = None) -> int:
+    """
+    Populate the accent-folded <field>_search shadow columns from the source fields.
+    Refreshes every product when product_ids is None.
+    """
+    columns = ", ".join(SEARCH_FIELDS)
+    if product_ids is None:
+        cursor.execute(f"SELECT id, {columns} FROM products")
+    else:
+        cursor.execute(f"SELECT id, {columns} FROM products WHERE id = ANY(%s)", (list(product_ids),))
+    rows = cursor.fetchall()
+
+    assignments = ", ".join(f"{search_column(field)} = %s" for field in SEARCH_FIELDS)
+    cursor.executemany(
+        f"UPDATE products SET {assignments} WHERE id = %s",
+        [tuple(normalize_search_text(row[field]) for field in SEARCH_FIELDS) + (row["id"],) for row in rows],
+    )
+    return len(rows)
+
+UPDATABLE_PRODUCT_FIELDS = [
+    "name", "color", "capacity", "price", "original_price",
+    "policy", "specifications", "address", "image_url", "product_information",
+]
+
+def update_product(product_id: int, **fields) -> None:
+    """
+    Update a product, refresh its search columns and bump the catalog version.
+    """
+    unknown = [field for field in fields if field not in UPDATABLE_PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown product fields: {unknown}")
+    if not fields:
+        return
+
+    assignments = ", ".join(f"{field} = %s" for field in fields)
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"UPDATE products SET {assignments} WHERE id = %s", (*fields.values(), product_id))
+            refresh_product_search_columns(cursor, [product_id])
+            refresh_product_display_columns(cursor, [product_id])
+            version = bump_catalog_version(cursor)
+        conn.commit()
+
+    # Bỏ cache kết quả tìm kiếm của tiến trình này ngay, không chờ lần kiểm tra phiên bản kế tiếp
+    product_search_cache.set_version(version)
+
 def get_product_by_name(name: str) -> Optional[Dict]:
     """
     Get a product by its name.
     """
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT name, capacity, color, price, image_url FROM products WHERE LOWER(name) LIKE LOWER(%s)", (f"%{name}%",))
+            cursor.execute(
+                "SELECT name, capacity_display AS capacity, color, price_display AS price, color_image_url AS image_url "
+                "FROM products WHERE LOWER(name) LIKE LOWER(%s)",
+                (f"%{name}%",),
+            )
             rows = cursor.fetchall()
             
             if rows:
                 for row in rows:
-                    if not any(unit in row['capacity'] for unit in ['MB', 'GB', 'TB']):
+                    # Display values are precomputed; capacity_display is NULL when it has no unit
+                    if not row['capacity']:
                         row.pop('capacity', None)
-                    
-                    row['price'] = format_currency_vn(row['price'])
-
-                    color = row['color'].strip().split(",")[0]
-
-                    image_path = f"https://raw.githubusercontent.com/Dat-ABC/share-host-files/main/product_images/{row['image_url']}/{slugify(color)}/{color}.png?raw=true".replace(" ", "%20")
-
-                    row['image_url'] = image_path
 
                     # Gửi yêu cầu get để kiểm tra sự tồn tại của tệp
                     # response = requests.get(image_path)
@@ -88,36 +187,37 @@ def get_product_by_name(name: str) -> Optional[Dict]:
 
             return rows
 
+def image_path_from_url(url: str) -> str:
+    """
+    Relative product_images path of an image URL built by compute_display_fields.
+    """
+    return url[len(IMAGE_BASE_URL) + 1:].split("?")[0].replace("%20", " ")
+
+def _drop_missing_images(rows: List[Dict]) -> List[Dict]:
+    for row in rows:
+        # capacity_display is NULL when it has no unit
+        if not row['capacity']:
+            row.pop('capacity', None)
+
+        # Checked against the offline image manifest instead of an HTTP request per row
+        if not row['image_url'] or not image_exists(image_path_from_url(row['image_url'])):
+            row.pop('image_url', None)
+    return rows
+
 def get_products_by_price(price: float) -> List[Dict]:
     """
     Get products within a specified price range.
     """
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT name, capacity, color, price, image_url FROM products WHERE price BETWEEN %s AND %s", (price - 500000, price + 500000))
+            cursor.execute(
+                "SELECT name, capacity_display AS capacity, color, price_display AS price, color_image_url AS image_url "
+                "FROM products WHERE price BETWEEN %s AND %s",
+                (price - 500000, price + 500000),
+            )
             rows = cursor.fetchall()
-            
-            if rows:
-                for row in rows:
-                    if not any(unit in row['capacity'] for unit in ['MB', 'GB', 'TB']):
-                        row.pop('capacity', None)
-                    
-                    row['price'] = format_currency_vn(row['price'])
-                    
-                    color = row['color'].strip().split(",")[0]
-
-                    image_path = f"https://raw.githubusercontent.com/Dat-ABC/share-host-files/main/product_images/{row['image_url']}/{slugify(color)}/{color}.png?raw=true".replace(" ", "%20")
-
-                        # Gửi yêu cầu get để kiểm tra sự tồn tại của tệp
-                    response = requests.get(image_path)
 
-                    if response.status_code == 200:
-                        row['image_url'] = image_path
-                    else:
-                        row.pop('image_url', None)
-                            
-
-            return rows
+    return _drop_missing_images(rows)
 
 def get_product_by_address(name:str) -> Optional[Dict]:
     """
@@ -125,29 +225,14 @@ def get_product_by_address(name:str) -> Optional[Dict]:
     """
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT name, capacity, color, price,  FROM products WHERE LOWER(name) LIKE LOWER(%s)", (f"%{name}%", ))
+            cursor.execute(
+                "SELECT name, capacity_display AS capacity, color, price_display AS price, address, color_image_url AS image_url "
+                "FROM products WHERE LOWER(name) LIKE LOWER(%s)",
+                (f"%{name}%", ),
+            )
             rows = cursor.fetchall()
 
-            if rows:
-                for row in rows:
-                    if not any(unit in row['capacity'] for unit in ['MB', 'GB', 'TB']):
-                        row.pop('capacity', None)
-                    
-                    row['price'] = format_currency_vn(row['price'])
-
-                    color = row['color'].strip().split(",")[0]
-
-                    image_path = f"https://raw.githubusercontent.com/Dat-ABC/share-host-files/main/product_images/{row['image_url']}/{slugify(color)}/{color}.png?raw=true".replace(" ", "%20")
-
-                        # Gửi yêu cầu get để kiểm tra sự tồn tại của tệp
-                    response = requests.get(image_path)
-
-                    if response.status_code == 200:
-                        row['image_url'] = image_path
-                    else:
-                        row.pop('image_url', None)
-                            
-            return row
+    return _drop_missing_images(rows)
         
 def get_product_by_specs(specs: str) -> Optional[Dict]:
     """
@@ -400,7 +485,10 @@ def get_valid_image_url(base_path, filename, extensions=['png', 'jpg']):
 
 #     return query
 
-def get_flexible_product_search(
+def _to_numeric(value) -> Decimal:
+    return Decimal(str(value))
+
+def build_flexible_product_query(
     use_columns: List[str] = None,
     name: List[str] = None,
     price: float = 0,
@@ -416,12 +504,17 @@ def get_flexible_product_search(
     discount_percent: List[float] = None,
     sort_by: str = "",
     limit: int = 0
-) -> Optional[List[Dict]]:
+) -> Tuple[str, tuple]:
+    """
+    Build the SQL query and its parameters for a flexible product search.
+    """
     # Initialize parameters and values
     parameters = []
     values = []
     condition_groups = condition_groups or {}
     operator_flags = operator_flags or {}
+    # Operators come from the model's tool arguments and are joined into the SQL text
+    group_operator = normalize_operator(group_operator, "AND")
 
     # Helper to add conditions for a list of strings with specified operator
     def add_conditions(field: str, items: List[str], operator: str = "OR"):
@@ -429,19 +522,20 @@ def get_flexible_product_search(
             return
 
         # Get operator from flags or use default
-        op = operator_flags.get(field, operator).upper()
+        op = normalize_operator(operator_flags.get(field), operator)
         
-        # Generate patterns
-        patterns = [f"%{item.lower()}%" for item in items]
+        # Generate patterns, accent-folded the same way as the <field>_search columns
+        patterns = [f"%{normalize_search_text(item)}%" for item in items]
+        column = search_column(field)
         
-        if op == "AND":
-            # Create individual LIKE conditions joined by AND
-            conditions = [f"LOWER({field}) LIKE %s" for _ in patterns]
-            return f"({' AND '.join(conditions)})", patterns
+        # One array parameter per field keeps the SQL text independent of list lengths
+        if op == "AND" and len(patterns) > 1:
+            # LIKE ALL cannot use the trigram index on its own, so the LIKE ANY
+            # on the same array drives the index scan and LIKE ALL filters the candidates
+            return f"({column} LIKE ANY (%s) AND {column} LIKE ALL (%s))", [patterns, patterns]
         else:
             # Use LIKE ANY for OR conditions
-            placeholders = ", ".join(["%s"] * len(patterns))
-            return f"LOWER({field}) LIKE ANY (ARRAY[{placeholders}])", patterns
+            return f"{column} LIKE ANY (%s)", [patterns]
 
     # Process condition groups
     group_conditions = []
@@ -476,8 +570,8 @@ def get_flexible_product_search(
                 field_values.extend(values_list)
 
         if field_conditions:
-            group_op = operator_flags.get(group_name, 'OR').upper()
-            group_conditions.append(f"({' ' + group_op + ' '.join(field_conditions)})")
+            group_op = normalize_operator(operator_flags.get(group_name), 'OR')
+            group_conditions.append(f"({f' {group_op} '.join(field_conditions)})")
             values.extend(field_values)
 
     # Process ungrouped conditions
@@ -509,19 +603,26 @@ def get_flexible_product_search(
         values.extend(values_list)
 
     # Process price and discount conditions
+    # Numbers are bound as numeric so int/float inputs share one prepared statement
     if price_range and len(price_range) == 2:
         parameters.append("price BETWEEN %s AND %s")
-        values.extend(price_range)
+        values.extend(_to_numeric(v) for v in price_range)
 
     if discount_percent and len(discount_percent) == 2:
         parameters.append("(original_price - price) / original_price * 100 BETWEEN %s AND %s")
-        values.extend(discount_percent)
+        values.extend(_to_numeric(v) for v in discount_percent)
 
     # Build base query
-    if use_columns:
-        base_query = f"SELECT {', '.join(use_columns)} FROM products"
-    else:
-        base_query = "SELECT name, capacity, color, price, image_url, specifications FROM products"
+    columns = use_columns or ['name', 'capacity', 'color', 'price', 'image_url', 'specifications']
+    unknown = [column for column in columns if column not in PRODUCT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown product columns: {unknown}")
+    # Return the precomputed display value under the original column name
+    select_list = ', '.join(
+        f"{DISPLAY_COLUMNS[column]} AS {column}" if column in DISPLAY_COLUMNS else column
+        for column in columns
+    )
+    base_query = f"SELECT {select_list} FROM products"
 
     # Combine all conditions with group_operator
     where_clause = ""
@@ -533,61 +634,120 @@ def get_flexible_product_search(
     if price and price > 0:
         # Order by absolute difference in price, closest first
         order_clause = " ORDER BY ABS(price - %s) ASC"
-        values.append(price)
+        values.append(_to_numeric(price))
         # Always limit to top 10 nearest
         limit_clause = " LIMIT 10"
     else:
         # Fallback to sort_by or no ordering
+        # Qualified so ORDER BY uses the numeric column, not the "price" display alias
         if sort_by == 'price_asc':
-            order_clause = ' ORDER BY price ASC'
+            order_clause = ' ORDER BY products.price ASC'
         elif sort_by == 'price_desc':
-            order_clause = ' ORDER BY price DESC'
+            order_clause = ' ORDER BY products.price DESC'
         else:
             order_clause = ''
-        limit_clause = f' LIMIT {limit}' if limit and limit > 0 else ''
+        limit_clause = ''
+        if limit and limit > 0:
+            limit_clause = ' LIMIT %s'
+            values.append(int(limit))
 
     # Combine query
     query = f"{base_query}{where_clause}{order_clause}{limit_clause}"
 
+    return query, tuple(values)
+
+def format_product_rows(rows: List[Dict]) -> List[Dict]:
+    """
+    Post-process product rows returned by a flexible search.
+
+    Prices, capacity and image URLs are already display values (see compute_display_fields).
+    """
+    for row in rows:
+        # capacity_display is NULL when the stored capacity has no unit
+        if 'capacity' in row and row['capacity'] is None:
+            row.pop('capacity')
+
+        if row.get("product_information", ""):
+            row.pop("product_information", None)
+
+    return rows
+
+@timed_stage("product_search_query")
+def _run_flexible_product_search(**kwargs) -> List[Dict]:
+    # Dùng catalog trong bộ nhớ nếu đã bật và đã nạp
+    if catalog_engine.is_ready():
+        return format_product_rows(catalog_engine.search(**kwargs))
+
+    query, values = build_flexible_product_query(**kwargs)
+
     # Execute and post-process
+    # Kết nối riêng chỉ dùng một lần nên không prepare (prepare chỉ có lợi trên kết nối của pool)
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute(query, tuple(values))
+            cursor.execute(query, values)
             rows = cursor.fetchall()
 
-    # Format results
-    for row in rows:
-        # Clean capacity if unit missing
-        cap = row.get('capacity', '')
-        if cap and not any(unit in cap for unit in ['MB', 'GB', 'TB']):
-            row.pop('capacity', None)
+    return format_product_rows(rows)
 
-        if row.get("product_information", ""):
-            row.pop("product_information", None)
+@timed_stage("product_search_query")
+async def _arun_flexible_product_search(**kwargs) -> List[Dict]:
+    if catalog_engine.is_ready():
+        return format_product_rows(catalog_engine.search(**kwargs))
 
-        # Format prices
-        price = row.get('price', '')
-        if price:
-            row['price'] = format_currency_vn(row['price'])
-        
-        if 'original_price' in row:
-            row['original_price'] = format_currency_vn(row['original_price'])
-
-        # Build image URLs per color
-        image_path = row.get('image_url', '')
-        if image_path:
-            image_path = image_path.split(",")[0]
-            row['image_url'] = f"https://raw.githubusercontent.com/Dat-ABC/share-host-files/main/product_images/{image_path}?raw=true".replace(" ", "%20")
-        # color_list = [c.strip() for c in row.get('color', '').split(',') if c.strip()]
-        # base_img = row.get('image_url', '')
-        # row['image_url'] = [
-        #     (
-        #         f"https://raw.githubusercontent.com/Dat-ABC/share-host-files/main/product_images/"
-        #         f"{base_img}/{slugify(c)}/{c}.png?raw=true".replace(' ', '%20')
-        #     )
-        #     for c in color_list
-        # ]
+    query, values = build_flexible_product_query(**kwargs)
+
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cursor:
+            # Prepared per pooled connection: repeated shapes skip parsing and planning
+            await cursor.execute(query, values, prepare=True)
+            rows = await cursor.fetchall()
+
+    return format_product_rows(rows)
+
+def get_flexible_product_search(**kwargs) -> Optional[List[Dict]]:
+    if not product_search_cache.enabled:
+        return _run_flexible_product_search(**kwargs)
+
+    if catalog_engine.is_ready():
+        # Kết quả lấy từ snapshot trong bộ nhớ: gắn phiên bản của snapshot, không phải của database
+        product_search_cache.set_version(catalog_engine.version)
+    elif not product_search_cache.version_is_fresh():
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                product_search_cache.set_version(get_catalog_version(cursor))
 
+    key = canonical_search_key(**kwargs)
+    rows = product_search_cache.get(key)
+    if rows is not None:
+        return rows
+
+    version = product_search_cache.version
+    start = time.perf_counter()
+    rows = _run_flexible_product_search(**kwargs)
+    product_search_cache.put(key, rows, (time.perf_counter() - start) * 1000, version)
+    return rows
+
+async def aget_flexible_product_search(**kwargs) -> Optional[List[Dict]]:
+    """
+    Async version of get_flexible_product_search using the shared pool.
+    """
+    if not product_search_cache.enabled:
+        return await _arun_flexible_product_search(**kwargs)
+
+    if catalog_engine.is_ready():
+        product_search_cache.set_version(catalog_engine.version)
+    elif not product_search_cache.version_is_fresh():
+        product_search_cache.set_version(await aget_catalog_version())
+
+    key = canonical_search_key(**kwargs)
+    rows = product_search_cache.get(key)
+    if rows is not None:
+        return rows
+
+    version = product_search_cache.version
+    start = time.perf_counter()
+    rows = await _arun_flexible_product_search(**kwargs)
+    product_search_cache.put(key, rows, (time.perf_counter() - start) * 1000, version)
     return rows
 
 # def get_flexible_product_search(
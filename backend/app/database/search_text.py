@@ -0,0 +1,42 @@
+import re
+import unicodedata
+
+# Các cột văn bản dùng cho tìm kiếm, mỗi cột có một cột bóng <field>_search đã bỏ dấu
+SEARCH_FIELDS = ["name", "color", "capacity", "policy", "product_information", "address"]
+
+# Toán tử logic hợp lệ cho operator_flags và group_operator
+OPERATORS = ("AND", "OR")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def search_column(field: str) -> str:
+    return f"{field}_search"
+
+
+def normalize_operator(value: str, default: str) -> str:
+    """
+    Chuẩn hóa toán tử do model truyền vào thành "AND"/"OR"; giá trị rỗng dùng default.
+    Toán tử được ghép vào câu SQL nên mọi giá trị khác đều bị từ chối.
+    """
+    if value is None or not str(value).strip():
+        return default
+    op = str(value).strip().upper()
+    if op not in OPERATORS:
+        raise ValueError(f"Invalid operator {value!r}, expected 'AND' or 'OR'")
+    return op
+
+
+def normalize_search_text(text: str) -> str:
+    """
+    Chuẩn hóa văn bản để tìm kiếm không phân biệt dấu: "Điện Thoại" -> "dien thoai".
+
+    Cùng cách bỏ dấu NFKD như slugify trong product_service, thêm xử lý "đ"
+    (NFKD không tách được) và gộp khoảng trắng. Dùng cho cả dữ liệu lưu vào
+    cột <field>_search và từ khóa tìm kiếm để hai bên khớp nhau.
+    """
+    if text is None:
+        return None
+    normalized = unicodedata.normalize("NFKD", text.replace("đ", "d").replace("Đ", "D"))
+    without_accents = "".join(c for c in normalized if not unicodedata.combining(c))
+    return _WHITESPACE_RE.sub(" ", without_accents.lower())
@@ -1,6 +1,12 @@
 from app.database.chat_history_service import get_connection
-from app.database.product_service import create_product_table
+from app.database.product_service import (
+    create_product_table,
+    refresh_product_search_columns,
+    refresh_product_display_columns,
+)
 from app.database.chat_history_service import create_chat_history_table
+from app.database.migrations import run_migrations
+from app.database.catalog_version import bump_catalog_version
 import pandas as pd
 import re
 from decimal import InvalidOperation
@@ -114,6 +120,7 @@ def seed_data_to_database():
     # Tạo bảng products nếu chưa tồn tại
     create_product_table()
     create_chat_history_table()
+    run_migrations()
 
     # Chuẩn bị dữ liệu
     df_renamed = prepare_data()
@@ -133,6 +140,13 @@ def seed_data_to_database():
         for index, row in df_renamed.iterrows():
             cur.execute(insert_sql, tuple(row))
         print(f"Inserted {len(df_renamed)} rows into products table.")
+
+        # Tính các cột tìm kiếm đã bỏ dấu và các cột hiển thị cho dữ liệu vừa chèn
+        refresh_product_search_columns(cur)
+        refresh_product_display_columns(cur)
+
+        # Báo cho các cache catalog trong tiến trình biết dữ liệu đã thay đổi
+        bump_catalog_version(cur)
         
         conn.commit()
         print("Database seeded successfully.")
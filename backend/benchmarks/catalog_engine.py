@@ -0,0 +1,130 @@
+"""
+So sánh catalog engine trong bộ nhớ với đường SQL của get_flexible_product_search:
+kiểm tra cùng kết quả trên các dạng truy vấn phổ biến và đo độ trễ của từng đường.
+
+Cần Postgres có dữ liệu sản phẩm (python -m app.database.seed_data) và numpy.
+
+    python -m benchmarks.catalog_engine --iterations 200
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+from app.database.catalog_engine import CatalogEngine
+from app.database.pool import open_pool, close_pool, get_pool
+from app.database.product_service import build_flexible_product_query
+
+QUERY_SHAPES: Dict[str, Dict[str, Any]] = {
+    "all": {},
+    "name": {"name": ["iphone 15"]},
+    "name_or_list": {"name": ["iphone 15", "galaxy s24", "xiaomi"]},
+    "name_and": {"name": ["iphone", "pro max"], "operator_flags": {"name": "AND"}},
+    "name_color_capacity": {"name": ["iphone"], "color": ["đen"], "capacity": ["256"]},
+    "columns": {"use_columns": ["id", "name", "price", "original_price", "address"], "name": ["samsung"]},
+    "price_range_sorted": {"price_range": [5000000, 20000000], "sort_by": "price_asc", "limit": 10},
+    "price_desc": {"name": ["oppo"], "sort_by": "price_desc", "limit": 5},
+    "price_proximity": {"name": ["samsung"], "price": 15000000},
+    "discount": {"discount_percent": [10, 30], "sort_by": "price_asc"},
+    "address": {"address": ["cầu giấy"]},
+    "unaccented": {"address": ["cau giay"], "color": ["DEN"]},
+    "policy": {"policy": ["trả góp"], "name": ["xiaomi"]},
+    "product_information": {"product_information": ["snapdragon"]},
+    "wildcard": {"name": ["iphone_15"]},
+    "groups": {
+        "name": ["iphone"],
+        "product_information": ["a17"],
+        "color": ["trắng"],
+        "condition_groups": {"device": ["name", "product_information"]},
+        "operator_flags": {"device": "AND"},
+    },
+    "groups_or": {
+        "name": ["galaxy"],
+        "color": ["tím"],
+        "price_range": [0, 12000000],
+        "group_operator": "OR",
+    },
+}
+
+# Các truy vấn không có ORDER BY (hoặc có giá trị sắp xếp trùng) nên được so sánh như tập hợp
+ORDERED_KEY = "price"
+
+
+def _normalize(rows: List[Dict[str, Any]], ordered: bool) -> List[Any]:
+    items = [tuple(sorted((k, str(v)) for k, v in row.items())) for row in rows]
+    return items if ordered else sorted(items)
+
+
+async def run_sql(kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    query, values = build_flexible_product_query(**kwargs)
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, values)
+            return await cur.fetchall()
+
+
+def _same_result(sql_rows, engine_rows, kwargs) -> bool:
+    ordered = bool(kwargs.get("sort_by") or kwargs.get("price"))
+    if not ordered:
+        return _normalize(sql_rows, False) == _normalize(engine_rows, False)
+    if len(sql_rows) != len(engine_rows):
+        return False
+    if "price" in (kwargs.get("use_columns") or ["price"]):
+        # Với cùng giá, thứ tự của SQL không xác định: so sánh dãy giá và tập dòng
+        if [r["price"] for r in sql_rows] != [r["price"] for r in engine_rows]:
+            return False
+    limit_applies = kwargs.get("price") or kwargs.get("limit")
+    if limit_applies:
+        return True
+    return _normalize(sql_rows, False) == _normalize(engine_rows, False)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def main(iterations: int) -> int:
+    await open_pool()
+    try:
+        engine = CatalogEngine(mode="memory")
+        await engine.load()
+        print(f"loaded {engine.stats()['products']} products in {engine.last_load_ms:.1f} ms\n")
+
+        failures = 0
+        print(f"{'shape':<22}{'rows':>6}{'sql p50 us':>12}{'mem p50 us':>12}{'mem p99 us':>12}  result")
+        for shape, kwargs in QUERY_SHAPES.items():
+            sql_rows = await run_sql(kwargs)
+            engine_rows = engine.search(**kwargs)
+            ok = _same_result(sql_rows, engine_rows, kwargs)
+            failures += 0 if ok else 1
+
+            sql_times = []
+            for _ in range(max(1, iterations // 10)):
+                start = time.perf_counter()
+                await run_sql(kwargs)
+                sql_times.append((time.perf_counter() - start) * 1e6)
+
+            mem_times = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                engine.search(**kwargs)
+                mem_times.append((time.perf_counter() - start) * 1e6)
+
+            print(
+                f"{shape:<22}{len(sql_rows):>6}{statistics.median(sql_times):>12.0f}"
+                f"{statistics.median(mem_times):>12.0f}{_percentile(mem_times, 0.99):>12.0f}  "
+                f"{'same' if ok else 'DIFFERENT'}"
+            )
+    finally:
+        await close_pool()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.iterations)))
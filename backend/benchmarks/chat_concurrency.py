@@ -0,0 +1,88 @@
+"""
+Kiểm tra /chat không chặn event loop: chạy N request không-stream cùng lúc
+với một LLM giả có độ trễ cố định và xác nhận các lần gọi LLM chạy chồng lên nhau.
+
+Không cần Postgres: agent được build với LLM giả qua build_llm_and_agent(llm=...),
+lịch sử chat được thay bằng bản trong bộ nhớ, answer cache và intent router bị tắt
+để mọi request đều gọi LLM.
+
+    python -m benchmarks.chat_concurrency --requests 20 --delay 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+from app.core.ai import service
+from app.core.ai import prompts
+from benchmarks.fake_llm import FakeChatModel, max_overlap
+
+
+class InMemoryHistory:
+    """
+    Thay cho lịch sử chat trong Postgres: đọc trả về rỗng, ghi chỉ đếm số lượt đã lưu.
+    """
+
+    def __init__(self):
+        self.saved = 0
+
+    async def aget_recent_chat_history(self, thread_id: str, limit: int = 10):
+        return []
+
+    async def asave_chat_turn(self, thread_id: str, question: str, answer: str, *args, **kwargs) -> None:
+        self.saved += 1
+
+
+async def run(num_requests: int, delay: float) -> int:
+    llm = FakeChatModel(delay=delay, calls=[])
+    agent_executor = service.build_llm_and_agent(service.OPENAI_MODEL, prompts.product_prompt_6, llm=llm)
+
+    async def aget_agent(model: str = service.OPENAI_MODEL):
+        return agent_executor
+
+    # Câu hỏi giống nhau: không để answer cache/intent router trả lời thay LLM
+    service.answer_cache.max_entries = 0
+    service.intent_router.enabled = False
+
+    history = InMemoryHistory()
+    service.aget_llm_and_agent = aget_agent
+    service.aget_recent_chat_history = history.aget_recent_chat_history
+    service.asave_chat_turn = history.asave_chat_turn
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        service.get_answer_from_llm("xin chào", f"bench-{uuid.uuid4()}")
+        for _ in range(num_requests)
+    ])
+    elapsed = time.perf_counter() - start
+
+    overlap = max_overlap(llm.calls)
+    serial_time = num_requests * delay
+    print(f"requests: {num_requests}, llm delay: {delay:.2f}s, turns saved: {history.saved}")
+    print(f"wall time: {elapsed:.2f}s (serial would be >= {serial_time:.2f}s)")
+    print(f"max concurrent llm calls: {overlap}")
+
+    if num_requests > 1 and (overlap < 2 or elapsed >= serial_time / 2):
+        print("FAIL: requests did not overlap")
+        return 1
+    if history.saved != num_requests:
+        print("FAIL: not every turn was saved")
+        return 1
+    print("OK: requests overlapped")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.requests, args.delay)))
+
+
+if __name__ == "__main__":
+    main()
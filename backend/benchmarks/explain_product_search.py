@@ -0,0 +1,113 @@
+"""
+Kiểm tra bằng EXPLAIN rằng planner *chọn* index trigram cho các dạng truy vấn phổ biến
+của get_flexible_product_search thay vì seq scan trên bảng products.
+
+Với bảng nhỏ (vài trăm dòng) seq scan rẻ hơn và planner chọn nó là đúng, nên kết quả
+chỉ có ý nghĩa với số dòng giống production. Nếu bảng có ít hơn --min-rows dòng, script
+thêm các dòng đệm (text ngẫu nhiên, không khớp truy vấn nào) trong transaction, chạy
+ANALYZE rồi EXPLAIN không ép plan; cuối cùng rollback nên dữ liệu không đổi.
+
+Yêu cầu: Postgres có extension pg_trgm và đã chạy migration (python -m app.database.migrations).
+
+    python -m benchmarks.explain_product_search --min-rows 50000
+    python -m benchmarks.explain_product_search --force-index   # chỉ kiểm tra index dùng được
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+from app.database.chat_history_service import get_connection
+from app.database.product_service import build_flexible_product_query
+from app.database.search_text import SEARCH_FIELDS, search_column
+
+QUERY_SHAPES: Dict[str, Dict[str, Any]] = {
+    "name": {"name": ["iphone 15"]},
+    "name_or_list": {"name": ["iphone 15", "galaxy s24", "xiaomi 14"]},
+    "name_and": {"name": ["iphone", "pro max"], "operator_flags": {"name": "AND"}},
+    "name_color_capacity": {"name": ["iphone 15"], "color": ["đen"], "capacity": ["256gb"]},
+    "name_price_range": {"name": ["samsung"], "price_range": [5000000, 20000000], "sort_by": "price_asc"},
+    "address": {"address": ["cầu giấy"]},
+    "policy": {"name": ["oppo"], "policy": ["trả góp"]},
+    "product_information": {"product_information": ["snapdragon"]},
+}
+
+
+def _plan_nodes(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def explain(cursor, query: str, values: tuple) -> Dict[str, Any]:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", values)
+    row = cursor.fetchone()
+    result = row["QUERY PLAN"]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"]
+
+
+def pad_products(cursor, min_rows: int) -> int:
+    """
+    Thêm dòng đệm cho đủ min_rows dòng, sao chép các cột khác từ một dòng có sẵn;
+    các cột text được tìm kiếm (và cột bóng _search) là chuỗi ngẫu nhiên. Trả về số dòng đã thêm.
+    """
+    cursor.execute("SELECT COUNT(*) AS count FROM products")
+    missing = min_rows - cursor.fetchone()["count"]
+    if missing <= 0:
+        return 0
+
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'products' AND column_name <> 'id'
+        ORDER BY ordinal_position
+    """)
+    columns = [row["column_name"] for row in cursor.fetchall()]
+    random_text = set(SEARCH_FIELDS) | {search_column(field) for field in SEARCH_FIELDS}
+    select_list = ", ".join(
+        f"'pad ' || md5(g::text || '{column}')" if column in random_text else f"p.{column}"
+        for column in columns
+    )
+    cursor.execute(f"""
+        INSERT INTO products ({', '.join(columns)})
+        SELECT {select_list}
+        FROM (SELECT * FROM products LIMIT 1) p, generate_series(1, %s) g
+    """, (missing,))
+    return missing
+
+
+def main(args) -> int:
+    failures = 0
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            padded = pad_products(cursor, args.min_rows)
+            cursor.execute("ANALYZE products")
+            cursor.execute("SELECT COUNT(*) AS count FROM products")
+            print(f"products: {cursor.fetchone()['count']} rows ({padded} padding rows, rolled back)")
+            if args.force_index:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for shape, kwargs in QUERY_SHAPES.items():
+                query, values = build_flexible_product_query(**kwargs)
+                nodes = _plan_nodes(explain(cursor, query, values))
+
+                seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "products"]
+                indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+
+                ok = not seq_scans and any(name.endswith("_trgm") for name in indexes)
+                failures += 0 if ok else 1
+                print(f"{'OK  ' if ok else 'FAIL'} {shape:<22} indexes={indexes}")
+        conn.rollback()
+
+    if failures:
+        print(f"{failures} query shape(s) fall back to a sequential scan")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-rows", type=int, default=50000, help="pad products to this many rows inside the transaction")
+    parser.add_argument("--force-index", action="store_true", help="disable seq scans (checks the index is usable, not chosen)")
+    sys.exit(main(parser.parse_args()))
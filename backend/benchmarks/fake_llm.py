@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model giả lập độ trễ của một lần gọi LLM, không cần mạng.
+    Ghi lại khoảng thời gian của từng lần gọi để kiểm tra các request có chạy chồng lên nhau không.
+    """
+    delay: float = 1.0
+    token_delay: float = 0.0
+    answer: str = "Xin chào! Tôi có thể giúp gì cho bạn?"
+    calls: List[tuple] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        start = time.perf_counter()
+        time.sleep(self.delay)
+        self.calls.append((start, time.perf_counter()))
+        return self._result()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        start = time.perf_counter()
+        await asyncio.sleep(self.delay)
+        self.calls.append((start, time.perf_counter()))
+        return self._result()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        start = time.perf_counter()
+        await asyncio.sleep(self.delay)
+        for token in self.answer.split(" "):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        self.calls.append((start, time.perf_counter()))
+
+
+class FakeToolCallingModel(BaseChatModel):
+    """
+    Chat model giả cho tools agent: nếu chưa có kết quả tool nào thì trả về
+    tất cả tool_calls trong một lượt, ngược lại trả lời cuối cùng.
+    """
+    delay: float = 0.1
+    tool_calls: List[Dict[str, Any]] = []
+    answer: str = "Đây là kết quả so sánh."
+    calls: List[tuple] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tool-calling-model"
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        if any(isinstance(message, ToolMessage) for message in messages):
+            return AIMessage(content=self.answer)
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": call["name"], "args": call["args"], "id": f"call_{i}"}
+                for i, call in enumerate(self.tool_calls)
+            ],
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        start = time.perf_counter()
+        time.sleep(self.delay)
+        self.calls.append((start, time.perf_counter()))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        start = time.perf_counter()
+        await asyncio.sleep(self.delay)
+        self.calls.append((start, time.perf_counter()))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+
+def max_overlap(intervals: List[tuple]) -> int:
+    """
+    Số khoảng thời gian chồng lên nhau nhiều nhất tại một thời điểm.
+    """
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
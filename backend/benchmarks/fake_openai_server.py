@@ -0,0 +1,225 @@
+"""
+Server giả tương thích OpenAI (POST /v1/chat/completions, có stream và tool call)
+kèm Tavily giả (POST /search), để đo service mà không tốn tiền OpenAI/Tavily.
+
+Kịch bản cố định theo câu hỏi:
+- câu hỏi có "tin tức", "news", "mới nhất": gọi search_web
+- câu hỏi có "giá", "so sánh", "price": gọi flexible_product_search (một hoặc hai lần song song)
+- còn lại, hoặc khi đã có kết quả tool: stream câu trả lời answer_tokens token
+
+Usage được trả về (kể cả khi stream với stream_options.include_usage); cached_tokens
+giả lập prompt cache: system message đã gặp thì phần đó được tính là cached.
+
+    python -m benchmarks.fake_openai_server --port 9100 --ttft 0.3 --token-delay 0.02
+
+Chạy service với OPENAI_BASE_URL=http://127.0.0.1:9100/v1 và TAVILY_API_URL=http://127.0.0.1:9100.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = (
+    "Dưới đây là thông tin sản phẩm phù hợp với yêu cầu của bạn tại Hoàng Hà Mobile, "
+    "bao gồm giá bán, dung lượng, màu sắc và địa chỉ cửa hàng còn hàng."
+).split()
+PRODUCTS = ["iphone 15", "galaxy s24", "xiaomi 13t", "oppo reno11"]
+
+
+@dataclass
+class FakeServerConfig:
+    ttft: float = 0.3
+    token_delay: float = 0.02
+    answer_tokens: int = 120
+    search_latency: float = 0.3
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _plan_tool_calls(question: str) -> List[Dict[str, Any]]:
+    text = question.lower()
+    if any(word in text for word in ("tin tức", "news", "mới nhất")):
+        return [{"name": "search_web", "arguments": {"q": question}}]
+    if any(word in text for word in ("giá", "so sánh", "price")):
+        digest = int(hashlib.sha1(question.encode("utf-8")).hexdigest(), 16)
+        names = [PRODUCTS[digest % len(PRODUCTS)]]
+        if "so sánh" in text:
+            names.append(PRODUCTS[(digest + 1) % len(PRODUCTS)])
+        return [
+            {
+                "name": "flexible_product_search",
+                "arguments": {"name": [name], "use_columns": ["name", "capacity", "price", "address"], "limit": 5},
+            }
+            for name in names
+        ]
+    return []
+
+
+class FakeOpenAI:
+    def __init__(self, config: FakeServerConfig):
+        self.config = config
+        self._seen_prefixes = set()
+        self.requests = 0
+
+    def _usage(self, messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, Any]:
+        prompt_text = "".join(str(m.get("content") or "") for m in messages)
+        prompt_tokens = _approx_tokens(prompt_text)
+
+        # Giống OpenAI: prefix được cache theo khối 128 token, chỉ khi đã gặp và đủ 1024 token
+        system = str(messages[0].get("content") or "") if messages else ""
+        prefix_key = hashlib.sha1(system.encode("utf-8")).hexdigest()
+        cached = 0
+        if prefix_key in self._seen_prefixes and _approx_tokens(system) >= 1024:
+            cached = _approx_tokens(system) // 128 * 128
+        self._seen_prefixes.add(prefix_key)
+
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def _plan(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        messages = body.get("messages", [])
+        if not body.get("tools") or not messages or messages[-1].get("role") != "user":
+            return []
+        return _plan_tool_calls(str(messages[-1].get("content") or ""))
+
+    def _answer_tokens(self) -> List[str]:
+        n = self.config.answer_tokens
+        return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(n)]
+
+    async def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests += 1
+        await asyncio.sleep(self.config.ttft)
+        calls = self._plan(body)
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        if calls:
+            message["tool_calls"] = [
+                {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                 "function": {"name": c["name"], "arguments": json.dumps(c["arguments"], ensure_ascii=False)}}
+                for c in calls
+            ]
+            completion_tokens = 20 * len(calls)
+        else:
+            tokens = self._answer_tokens()
+            await asyncio.sleep(self.config.token_delay * len(tokens))
+            message["content"] = "".join(tokens)
+            completion_tokens = len(tokens)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if calls else "stop"}],
+            "usage": self._usage(body.get("messages", []), completion_tokens),
+        }
+
+    async def stream(self, body: Dict[str, Any]) -> AsyncIterator[bytes]:
+        self.requests += 1
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "fake")
+
+        def frame(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> bytes:
+            payload = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        await asyncio.sleep(self.config.ttft)
+        yield frame({"role": "assistant", "content": ""})
+
+        calls = self._plan(body)
+        if calls:
+            for index, call in enumerate(calls):
+                yield frame({"tool_calls": [{
+                    "index": index,
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call["arguments"], ensure_ascii=False)},
+                }]})
+            yield frame({}, "tool_calls")
+            completion_tokens = 20 * len(calls)
+        else:
+            tokens = self._answer_tokens()
+            for i, token in enumerate(tokens):
+                if i and self.config.token_delay:
+                    await asyncio.sleep(self.config.token_delay)
+                yield frame({"content": token})
+            yield frame({}, "stop")
+            completion_tokens = len(tokens)
+
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield frame({}, usage=self._usage(body.get("messages", []), completion_tokens))
+        yield b"data: [DONE]\n\n"
+
+
+def create_app(config: FakeServerConfig) -> FastAPI:
+    app = FastAPI()
+    fake = FakeOpenAI(config)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if body.get("stream"):
+            return StreamingResponse(fake.stream(body), media_type="text/event-stream")
+        return JSONResponse(await fake.completion(body))
+
+    @app.post("/search")
+    async def tavily_search(request: Request):
+        body = await request.json()
+        await asyncio.sleep(config.search_latency)
+        query = body.get("query", "")
+        return {
+            "query": query,
+            "answer": f"Tóm tắt tin tức giả cho '{query}'.",
+            "results": [
+                {
+                    "title": f"Tin điện thoại {i + 1}",
+                    "url": f"https://example.com/news/{i + 1}",
+                    "content": "Nội dung bài viết giả về thị trường điện thoại. " * 20,
+                }
+                for i in range(body.get("max_results", 5))
+            ],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": fake.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first chunk")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Tavily stub latency in seconds")
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeServerConfig(args.ttft, args.token_delay, args.answer_tokens, args.search_latency)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
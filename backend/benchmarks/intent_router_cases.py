@@ -0,0 +1,72 @@
+"""
+Kiểm tra detect_intent của intent router trên các câu hỏi mẫu có nhãn (không cần database):
+câu hỏi tra cứu giá/địa chỉ đơn giản được nhận diện, còn câu hỏi cần agent thì không.
+
+    python -m benchmarks.intent_router_cases
+"""
+import os
+import sys
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+from app.core.ai.intent_router import detect_intent, name_vocabulary
+
+# Thay cho tên sản phẩm đọc từ database
+VOCABULARY = name_vocabulary([
+    "iPhone 15 Pro Max",
+    "iPhone 15",
+    "Samsung Galaxy S24 Ultra",
+    "Xiaomi 14",
+    "OPPO Reno 11 5G",
+])
+
+# (câu hỏi, intent mong đợi hoặc None nếu phải qua agent, bộ lọc mong đợi)
+CASES = [
+    ("Giá iPhone 15 Pro Max", "price", {"name": ["iphone", "15", "pro", "max"]}),
+    ("iphone 15 bao nhiêu tiền vậy shop", "price", {"name": ["iphone", "15"]}),
+    ("Samsung S24 Ultra bao nhiêu", "price", {"name": ["samsung", "s24", "ultra"]}),
+    ("Cửa hàng nào có Xiaomi 14?", "address", {"name": ["xiaomi", "14"]}),
+    ("oppo reno 11 mua ở đâu", "address", {"name": ["oppo", "reno", "11"]}),
+    # Dung lượng và màu lọc theo cột riêng, không tìm trong tên
+    ("giá iPhone 15 Pro Max 256GB", "price", {"name": ["iphone", "15", "pro", "max"], "capacity": ["256gb"]}),
+    ("giá iphone 15 128 GB màu xanh dương", "price", {"name": ["iphone", "15"], "capacity": ["128gb"], "color": ["xanh duong"]}),
+    ("iPhone 15 Pro Max titan tự nhiên giá bao nhiêu", "price", {"name": ["iphone", "15", "pro", "max"], "color": ["titan tu nhien"]}),
+    # Từ không thuộc tên sản phẩm nào: để agent trả lời thay vì tìm theo tên
+    ("giá thu cũ iPhone 15", None, {}),
+    ("iPhone 16 khi nào ra, giá bao nhiêu", None, {}),
+    # "gia" sau khi bỏ dấu không phải lúc nào cũng là "giá"
+    ("iphone 15 cho gia đình", None, {}),
+    ("máy già rồi", None, {}),
+    # Catalog không có tồn kho: câu hỏi còn/hết hàng phải qua agent
+    ("Samsung S24 Ultra hết hàng chưa", None, {}),
+    ("iphone 15 còn hàng không", None, {}),
+    ("giá iphone 15 còn hàng không", None, {}),
+    # "bao nhiêu" không phải hỏi giá
+    ("iPhone 15 nặng bao nhiêu gram", None, {}),
+    ("iPhone 15 pin bao nhiêu mAh", None, {}),
+    ("iphone 15 có bao nhiêu màu", None, {}),
+    # So sánh, tư vấn, khoảng giá, câu phụ thuộc ngữ cảnh
+    ("So sánh giá iPhone 15 và Galaxy S24", None, {}),
+    ("điện thoại giá dưới 5 triệu", None, {}),
+    ("nên mua iphone 15 hay 16", None, {}),
+    ("giá của nó là bao nhiêu", None, {}),
+    ("xin chào", None, {}),
+]
+
+
+def main() -> int:
+    failures = 0
+    for question, expected_intent, expected_filters in CASES:
+        intent, filters, reason = detect_intent(question, VOCABULARY)
+        ok = intent == expected_intent and (intent is None or filters == expected_filters)
+        failures += 0 if ok else 1
+        print(f"{'OK  ' if ok else 'FAIL'} {question!r:<50} -> {intent} {filters} ({reason})")
+
+    if failures:
+        print(f"{failures} of {len(CASES)} cases misrouted")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Load driver cho /api/chat/chat/stream và /api/chat/chat với số request đồng thời cố định.
+Báo cáo TTFT (tới frame SSE đầu tiên), khoảng cách giữa các frame (ITL), độ trễ toàn phần
+theo percentile, số request/s và bộ nhớ server tăng thêm trên mỗi stream đồng thời.
+
+Với --spawn, driver tự chạy server OpenAI/Tavily giả (benchmarks.fake_openai_server) và
+service (uvicorn main:app) trỏ vào server giả; chỉ cần Postgres local (biến môi trường DB_*).
+
+    python -m benchmarks.load_driver --spawn --requests 200 --concurrency 20
+    python -m benchmarks.load_driver --url http://127.0.0.1:8030 --endpoint chat --server-pid 1234
+
+Mặc định mỗi câu hỏi có hậu tố riêng để không trúng answer cache; với --spawn, answer cache
+(trừ khi --repeat-questions) và intent router còn bị tắt hẳn, nên mọi request đều qua agent
+và LLM giả. Báo cáo in số câu trả lời từ answer cache/intent router trong lần chạy để
+kiểm tra số đo là của đường LLM.
+Frame SSE đã được gộp token (SSE_COALESCE_MS) nên ITL là khoảng cách giữa các frame.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+import httpx
+
+try:
+    import psutil
+except ImportError:  # psutil là tùy chọn, chỉ cần để đo bộ nhớ server
+    psutil = None
+
+QUESTIONS = [
+    "xin chào, bạn có thể tư vấn giúp mình không",
+    "so sánh giá iPhone 15 và Galaxy S24",
+    "tin tức điện thoại mới nhất tháng này",
+    "giá điện thoại Xiaomi tầm trung nên mua loại nào",
+]
+
+# Service báo lỗi ngay trong nội dung câu trả lời (xem get_answer_streaming), không qua HTTP status
+ERROR_ANSWER_PREFIXES = (
+    "An error occurred:",
+    "I apologize, but I'm receiving too many requests right now.",
+)
+
+
+def is_error_answer(text: str) -> bool:
+    return any(prefix in text for prefix in ERROR_ANSWER_PREFIXES)
+
+
+class Result:
+    __slots__ = ("ok", "ttft_ms", "total_ms", "gaps_ms", "frames")
+
+    def __init__(self):
+        self.ok = True
+        self.ttft_ms: Optional[float] = None
+        self.total_ms = 0.0
+        self.gaps_ms: List[float] = []
+        self.frames = 0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def stream_request(client: httpx.AsyncClient, question: str) -> Result:
+    result = Result()
+    start = time.perf_counter()
+    last = None
+    contents: List[str] = []
+    try:
+        async with client.stream(
+            "POST", "/api/chat/chat/stream", json={"question": question, "thread_id": f"load-{uuid.uuid4()}"}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    result.ttft_ms = (now - start) * 1000
+                else:
+                    result.gaps_ms.append((now - last) * 1000)
+                last = now
+                result.frames += 1
+                payload = json.loads(line[6:])
+                if "error" in payload:
+                    result.ok = False
+                contents.append(payload.get("content", ""))
+    except Exception:
+        result.ok = False
+    result.total_ms = (time.perf_counter() - start) * 1000
+    # Lỗi có thể được gộp vào cùng frame với phần câu trả lời trước đó nên kiểm tra trên toàn bộ nội dung
+    result.ok = result.ok and result.frames > 0 and not is_error_answer("".join(contents))
+    return result
+
+
+async def chat_request(client: httpx.AsyncClient, question: str) -> Result:
+    result = Result()
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/chat/chat", json={"question": question, "thread_id": f"load-{uuid.uuid4()}"})
+        response.raise_for_status()
+        answer = response.json().get("answer")
+        result.ok = bool(answer) and not is_error_answer(answer)
+    except Exception:
+        result.ok = False
+    result.total_ms = result.ttft_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+class MemorySampler:
+    """
+    Lấy mẫu RSS của tiến trình server trong lúc chạy tải để tính bộ nhớ trên mỗi stream đồng thời.
+    """
+
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.process = psutil.Process(pid) if psutil is not None and pid else None
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _rss(self) -> int:
+        # Tính cả các tiến trình con (worker của uvicorn)
+        processes = [self.process] + self.process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes)
+
+    async def _run(self) -> None:
+        while True:
+            self.peak = max(self.peak, self._rss())
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.process is None:
+            return
+        self.baseline = self.peak = self._rss()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+async def shortcut_counts(client: httpx.AsyncClient) -> Optional[Dict[str, int]]:
+    """
+    Số câu trả lời không qua LLM (answer cache, intent router) tính đến hiện tại.
+    """
+    try:
+        answer_cache = (await client.get("/api/system/stats/answer-cache")).json()
+        intent_router = (await client.get("/api/system/stats/intent-router")).json()
+        return {"answer_cache_hits": answer_cache["hits"], "intent_router_answers": intent_router["routed"]}
+    except (httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+async def run_load(
+    url: str, endpoint: str, requests: int, concurrency: int, unique: bool, server_pid: Optional[int], timeout: float
+) -> Dict[str, Any]:
+    call = stream_request if endpoint == "stream" else chat_request
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        # Warmup: nạp tokenizer, agent, kết nối pool trước khi đo
+        await call(client, QUESTIONS[0] + f" (warmup {uuid.uuid4().hex[:6]})")
+
+        async def one(i: int) -> Result:
+            question = QUESTIONS[i % len(QUESTIONS)]
+            if unique:
+                question = f"{question} (#{i}-{uuid.uuid4().hex[:6]})"
+            async with semaphore:
+                return await call(client, question)
+
+        shortcuts_before = await shortcut_counts(client)
+        sampler = MemorySampler(server_pid)
+        sampler.start()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        await sampler.stop()
+        shortcuts_after = await shortcut_counts(client)
+
+    ok = [r for r in results if r.ok]
+    ttft = [r.ttft_ms for r in ok if r.ttft_ms is not None]
+    total = [r.total_ms for r in ok]
+    gaps = [gap for r in ok for gap in r.gaps_ms]
+    report = {
+        "endpoint": endpoint,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": requests - len(ok),
+        "requests_per_s": len(ok) / elapsed if elapsed else 0.0,
+        "ttft_ms": {p: percentile(ttft, q) for p, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        "itl_ms": {p: percentile(gaps, q) for p, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        "total_ms": {p: percentile(total, q) for p, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        "avg_frames": statistics.mean(r.frames for r in ok) if ok and endpoint == "stream" else 0,
+    }
+    if shortcuts_before is not None and shortcuts_after is not None:
+        report["shortcuts"] = {key: shortcuts_after[key] - shortcuts_before[key] for key in shortcuts_after}
+    if sampler.process is not None:
+        report["memory"] = {
+            "baseline_mb": sampler.baseline / 2**20,
+            "peak_mb": sampler.peak / 2**20,
+            "per_stream_kb": (sampler.peak - sampler.baseline) / concurrency / 1024,
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def fmt(values: Dict[str, float]) -> str:
+        return " / ".join(f"{values[p]:8.1f}" for p in ("p50", "p90", "p99"))
+
+    print(f"\n== {report['endpoint']}: {report['requests']} requests, concurrency {report['concurrency']}")
+    print(f"errors            {report['errors']}")
+    print(f"requests/s        {report['requests_per_s']:.1f}")
+    print(f"                  {'p50':>8} / {'p90':>8} / {'p99':>8}")
+    print(f"ttft ms           {fmt(report['ttft_ms'])}")
+    if report["endpoint"] == "stream":
+        print(f"itl ms            {fmt(report['itl_ms'])}")
+        print(f"frames/stream     {report['avg_frames']:.1f}")
+    print(f"total ms          {fmt(report['total_ms'])}")
+    if "shortcuts" in report:
+        shortcuts = report["shortcuts"]
+        print(f"without LLM       {shortcuts['answer_cache_hits']} answer cache hits, "
+              f"{shortcuts['intent_router_answers']} intent router answers")
+    if "memory" in report:
+        memory = report["memory"]
+        print(f"server rss MB     {memory['baseline_mb']:.1f} -> {memory['peak_mb']:.1f} "
+              f"({memory['per_stream_kb']:.0f} KB per concurrent request)")
+
+
+async def wait_until_ready(url: str, path: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+            try:
+                if (await client.get(path)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url}{path} not ready after {timeout:.0f}s")
+
+
+def spawn_servers(args) -> List[subprocess.Popen]:
+    """
+    Chạy server giả và service trỏ vào server giả, trả về [fake server, service].
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai_server", "--port", str(args.fake_port),
+         "--ttft", str(args.ttft), "--token-delay", str(args.token_delay),
+         "--answer-tokens", str(args.answer_tokens), "--search-latency", str(args.search_latency)],
+        cwd=backend_dir,
+    )
+
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-fake"),
+        "TAVILY_API_URL": fake_url,
+        "TAVILY_API_KEY": os.environ.get("TAVILY_API_KEY", "stub"),
+        # Cache web search riêng cho mỗi lần chạy để kết quả lặp lại được
+        "WEB_SEARCH_CACHE_PATH": os.path.join(tempfile.mkdtemp(prefix="bench-"), "web_search.sqlite3"),
+        # Đo đường LLM: không để câu trả lời đến từ intent router hay answer cache
+        "INTENT_ROUTER_ENABLED": "false",
+        "ANSWER_CACHE_MAX_ENTRIES": os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000") if args.repeat_questions else "0",
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+    return [fake, app]
+
+
+async def main(args) -> int:
+    processes: List[subprocess.Popen] = []
+    url, server_pid = args.url, args.server_pid
+    try:
+        if args.spawn:
+            processes = spawn_servers(args)
+            url = f"http://127.0.0.1:{args.app_port}"
+            server_pid = processes[1].pid
+            await wait_until_ready(f"http://127.0.0.1:{args.fake_port}", "/stats", processes[0])
+            await wait_until_ready(url, "/api/system/stats/pool", processes[1])
+
+        endpoints = ["stream", "chat"] if args.endpoint == "both" else [args.endpoint]
+        reports = []
+        for endpoint in endpoints:
+            report = await run_load(
+                url, endpoint, args.requests, args.concurrency, not args.repeat_questions, server_pid, args.timeout
+            )
+            print_report(report)
+            reports.append(report)
+
+        if args.json:
+            print(json.dumps(reports, indent=2))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    return 1 if any(report["errors"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8030", help="service base URL (ignored with --spawn)")
+    parser.add_argument("--endpoint", choices=["stream", "chat", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--repeat-questions", action="store_true", help="reuse identical questions (answer cache hits)")
+    parser.add_argument("--server-pid", type=int, help="service PID for memory sampling (needs psutil)")
+    parser.add_argument("--json", action="store_true", help="also print the reports as JSON")
+    parser.add_argument("--spawn", action="store_true", help="start the fake OpenAI/Tavily server and the service")
+    parser.add_argument("--app-port", type=int, default=8031)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,84 @@
+"""
+Kiểm tra agent chạy nhiều tool trong một lượt model song song và mỗi tool bị giới hạn thời gian.
+
+Dùng model giả trả về nhiều tool_calls cùng lúc và các tool giả có độ trễ cố định,
+không cần mạng hay database.
+
+    python -m benchmarks.parallel_tools --tool-delay 0.5
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pydantic import BaseModel, Field
+from langchain.tools import BaseTool
+from app.core.ai import prompts
+from app.core.ai.service import build_llm_and_agent
+from app.core.ai.tools import run_with_timeout
+from benchmarks.fake_llm import FakeToolCallingModel
+
+
+class Query(BaseModel):
+    q: str = Field(..., description="Query")
+
+
+class SleepingTool(BaseTool):
+    name: str = "sleeping_tool"
+    description: str = "Stub tool that waits before answering"
+    args_schema: type[BaseModel] = Query
+    delay: float = 0.5
+    timeout: float = 5.0
+
+    def _run(self, q: str) -> str:
+        time.sleep(self.delay)
+        return f"{self.name}: {q}"
+
+    async def _arun(self, q: str) -> str:
+        async def work():
+            await asyncio.sleep(self.delay)
+            return f"{self.name}: {q}"
+        return await run_with_timeout(self.name, work(), self.timeout)
+
+
+def check(name: str, ok: bool, detail: str = "") -> int:
+    print(f"{'OK  ' if ok else 'FAIL'} {name} {detail}")
+    return 0 if ok else 1
+
+
+async def main(tool_delay: float, llm_delay: float) -> int:
+    tools = [
+        SleepingTool(name="price_iphone", delay=tool_delay),
+        SleepingTool(name="price_galaxy", delay=tool_delay),
+        SleepingTool(name="phone_news", delay=tool_delay),
+        SleepingTool(name="slow_tool", delay=tool_delay * 10, timeout=tool_delay),
+    ]
+    llm = FakeToolCallingModel(
+        delay=llm_delay,
+        tool_calls=[{"name": tool.name, "args": {"q": tool.name}} for tool in tools],
+    )
+    llm.calls = []
+    executor = build_llm_and_agent("fake", prompts.product_prompt_6, llm=llm, tools=tools)
+
+    start = time.perf_counter()
+    result = await executor.ainvoke({"input": "so sánh giá iPhone 15 và Galaxy S24, kèm tin mới", "chat_history": [], "current_date": "today"})
+    elapsed = time.perf_counter() - start
+
+    steps = result["intermediate_steps"]
+    observations = {action.tool: observation for action, observation in steps}
+    serial = len(tools) * tool_delay + 2 * llm_delay
+
+    failures = 0
+    failures += check("all tool calls ran in one model turn", len(llm.calls) == 2 and len(steps) == len(tools),
+                      f"(llm calls={len(llm.calls)}, tool steps={len(steps)})")
+    failures += check("tools ran concurrently", elapsed < tool_delay * 2 + 2 * llm_delay,
+                      f"(elapsed {elapsed:.2f}s, serial would be >= {serial:.2f}s)")
+    failures += check("slow tool was timed out", str(observations.get("slow_tool", "")).startswith("Error: slow_tool timed out"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tool-delay", type=float, default=0.5)
+    parser.add_argument("--llm-delay", type=float, default=0.1)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.tool_delay, args.llm_delay)))
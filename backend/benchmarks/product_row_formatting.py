@@ -0,0 +1,92 @@
+"""
+Micro-benchmark phần hậu xử lý dòng kết quả tìm kiếm sản phẩm:
+format giá/dung lượng/URL ảnh ở mỗi truy vấn (cách cũ) so với đọc cột hiển thị tính sẵn.
+
+Cần Postgres có dữ liệu sản phẩm đã chạy migration (python -m app.database.migrations).
+
+    python -m benchmarks.product_row_formatting --repeat 200
+"""
+import argparse
+import copy
+import statistics
+import sys
+import time
+from typing import Dict, List
+from app.database.chat_history_service import get_connection
+from app.database.product_service import (
+    build_flexible_product_query,
+    format_currency_vn,
+    format_product_rows,
+    IMAGE_BASE_URL,
+)
+
+RAW_QUERY = "SELECT name, capacity, color, price, original_price, image_url, specifications FROM products"
+
+
+def legacy_format_product_rows(rows: List[Dict]) -> List[Dict]:
+    # Hậu xử lý theo từng dòng như trước khi có cột hiển thị
+    for row in rows:
+        cap = row.get('capacity', '')
+        if cap and not any(unit in cap for unit in ['MB', 'GB', 'TB']):
+            row.pop('capacity', None)
+
+        if row.get("product_information", ""):
+            row.pop("product_information", None)
+
+        price = row.get('price', '')
+        if price:
+            row['price'] = format_currency_vn(row['price'])
+
+        if 'original_price' in row:
+            row['original_price'] = format_currency_vn(row['original_price'])
+
+        image_path = row.get('image_url', '')
+        if image_path:
+            image_path = image_path.split(",")[0]
+            row['image_url'] = f"{IMAGE_BASE_URL}/{image_path}?raw=true".replace(" ", "%20")
+
+    return rows
+
+
+def measure(rows: List[Dict], fn, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        batch = copy.deepcopy(rows)
+        start = time.perf_counter()
+        fn(batch)
+        timings.append((time.perf_counter() - start) * 1e6 / max(1, len(rows)))
+    return timings
+
+
+def main(repeat: int) -> int:
+    query, values = build_flexible_product_query(
+        use_columns=["name", "capacity", "color", "price", "original_price", "image_url", "specifications"]
+    )
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(RAW_QUERY)
+            raw_rows = cursor.fetchall()
+            cursor.execute(query, values)
+            display_rows = cursor.fetchall()
+
+    legacy = legacy_format_product_rows(copy.deepcopy(raw_rows))
+    current = format_product_rows(copy.deepcopy(display_rows))
+    same = legacy == current
+
+    print(f"{len(raw_rows)} rows, outputs {'identical' if same else 'DIFFERENT'}")
+    print(f"{'mode':<22}{'p50 us/row':>12}{'p99 us/row':>12}")
+    for mode, rows, fn in (
+        ("format per query", raw_rows, legacy_format_product_rows),
+        ("precomputed columns", display_rows, format_product_rows),
+    ):
+        timings = sorted(measure(rows, fn, repeat))
+        print(f"{mode:<22}{statistics.median(timings):>12.3f}{timings[int(len(timings) * 0.99) - 1]:>12.3f}")
+
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(main(args.repeat))
@@ -0,0 +1,104 @@
+"""
+Đo độ trễ truy vấn flexible product search khi Postgres phải parse/plan mỗi lần
+so với khi chạy dạng prepared statement trên cùng một connection của pool.
+
+Các tham số có độ dài danh sách khác nhau vẫn cho cùng câu SQL, nên số câu SQL khác nhau
+(và số prepared statement mỗi connection) nhỏ hơn nhiều so với số lời gọi.
+Cần Postgres có dữ liệu sản phẩm (python -m app.database.seed_data).
+
+    python -m benchmarks.product_search_prepared --iterations 300
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+from app.database.pool import open_pool, close_pool, get_pool
+from app.database.product_service import build_flexible_product_query
+
+NAMES = ["iphone 15", "galaxy s24", "xiaomi 14", "oppo reno", "vivo", "pro max", "ultra", "redmi"]
+COLORS = ["đen", "trắng", "xanh", "tím", "vàng"]
+
+
+def random_kwargs(rng: random.Random) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"name": rng.sample(NAMES, rng.randint(1, 4))}
+    if rng.random() < 0.5:
+        kwargs["color"] = rng.sample(COLORS, rng.randint(1, 3))
+    if rng.random() < 0.3:
+        kwargs["operator_flags"] = {"name": "AND"}
+    if rng.random() < 0.5:
+        low = rng.choice([0, 3000000, 5000000, 8000000])
+        kwargs["price_range"] = [low, low + rng.choice([5000000, 10000000, 20000000])]
+        kwargs["sort_by"] = rng.choice(["price_asc", "price_desc"])
+        kwargs["limit"] = rng.choice([5, 10, 20])
+    return kwargs
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run(calls: List[Dict[str, Any]], prepare: bool) -> List[float]:
+    timings = []
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            for kwargs in calls:
+                query, values = build_flexible_product_query(**kwargs)
+                start = time.perf_counter()
+                await cur.execute(query, values, prepare=prepare)
+                await cur.fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            await cur.execute("SELECT count(*) AS n FROM pg_prepared_statements")
+            prepared = (await cur.fetchone())["n"]
+        if prepare:
+            print(f"prepared statements on connection: {prepared}")
+    return timings
+
+
+async def planning_time(calls: List[Dict[str, Any]]) -> float:
+    times = []
+    async with get_pool().connection() as conn:
+        async with conn.cursor() as cur:
+            for kwargs in calls:
+                query, values = build_flexible_product_query(**kwargs)
+                await cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", values)
+                plan = (await cur.fetchone())["QUERY PLAN"][0]
+                times.append(plan["Planning Time"])
+    return statistics.median(times)
+
+
+async def main(iterations: int, seed: int) -> int:
+    rng = random.Random(seed)
+    calls = [random_kwargs(rng) for _ in range(iterations)]
+    shapes = {build_flexible_product_query(**kwargs)[0] for kwargs in calls}
+    print(f"{len(calls)} calls, {len(shapes)} distinct SQL shapes")
+
+    await open_pool()
+    try:
+        print(f"median planning time per unprepared query: {await planning_time(calls[:50]):.3f} ms")
+
+        # Chạy một lượt làm nóng cho cả hai chế độ để cache dữ liệu giống nhau
+        await run(calls[:20], prepare=False)
+        results = {
+            "planned each call": await run(calls, prepare=False),
+            "prepared": await run(calls, prepare=True),
+        }
+    finally:
+        await close_pool()
+
+    print(f"\n{'mode':<20}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, timings in results.items():
+        print(f"{mode:<20}{statistics.median(timings):>10.3f}{_percentile(timings, 0.99):>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.iterations, args.seed)))
@@ -0,0 +1,85 @@
+"""
+So sánh cách phát SSE cũ (json.dumps và một frame cho mỗi token) với frame đã gom
+và encode sẵn thành bytes: số frame (mỗi frame là một lần ghi socket), số byte,
+CPU của tiến trình và time-to-first-token.
+
+Nguồn token giả phát token với khoảng cách cố định, không cần model hay database.
+
+    python -m benchmarks.sse_coalescing --tokens 2000 --token-interval-ms 2
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import AsyncIterator, Dict
+from app.api.chat.sse import sse_frames, orjson
+
+TOKENS = ["Điện", " thoại", " iPhone", " 15", " Pro", " Max", " có", " giá", " 29.990.000", " vnđ", ".\n"]
+
+
+async def fake_tokens(count: int, interval: float) -> AsyncIterator[str]:
+    for i in range(count):
+        await asyncio.sleep(interval)
+        yield TOKENS[i % len(TOKENS)]
+
+
+async def legacy_frames(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    final_answer = ""
+    async for chunk in tokens:
+        final_answer += chunk
+        yield f"data: {json.dumps({'content': chunk})}\n\n"
+
+
+async def measure(frames: AsyncIterator) -> Dict[str, float]:
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    first = None
+    count = 0
+    size = 0
+    content = []
+    async for frame in frames:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+        data = frame.encode("utf-8") if isinstance(frame, str) else frame
+        size += len(data)
+        for line in data.decode("utf-8").split("\n"):
+            if line.startswith("data: "):
+                content.append(json.loads(line[6:])["content"])
+    return {
+        "frames": count,
+        "bytes": size,
+        "cpu_ms": (time.process_time() - cpu_start) * 1000,
+        "ttft_ms": (first or 0) * 1000,
+        "content": "".join(content),
+    }
+
+
+async def main(count: int, interval_ms: float, coalesce_ms: float, max_bytes: int) -> int:
+    interval = interval_ms / 1000
+    results = {
+        "per-token json.dumps": await measure(legacy_frames(fake_tokens(count, interval))),
+        f"coalesced {coalesce_ms:g}ms/{max_bytes}B": await measure(
+            sse_frames(fake_tokens(count, interval), coalesce_ms, max_bytes)
+        ),
+    }
+
+    print(f"{count} tokens, one every {interval_ms:g} ms, encoder: {'orjson' if orjson else 'json'}\n")
+    print(f"{'mode':<26}{'frames':>8}{'bytes':>10}{'cpu ms':>10}{'ttft ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<26}{result['frames']:>8}{result['bytes']:>10}{result['cpu_ms']:>10.1f}{result['ttft_ms']:>10.2f}")
+
+    contents = {result["content"] for result in results.values()}
+    print("\ncontent identical" if len(contents) == 1 else "\nCONTENT DIFFERS")
+    return 0 if len(contents) == 1 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--token-interval-ms", type=float, default=2)
+    parser.add_argument("--coalesce-ms", type=float, default=30)
+    parser.add_argument("--max-bytes", type=int, default=512)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.tokens, args.token_interval_ms, args.coalesce_ms, args.max_bytes)))
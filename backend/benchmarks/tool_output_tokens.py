@@ -0,0 +1,82 @@
+"""
+Đo số token (o200k_base) của kết quả tool đưa lại vào agent_scratchpad: repr list dict
+cũ so với bảng gọn của tool_output, và kiểm tra kết quả không vượt ngân sách của tool.
+
+Product search cần Postgres có dữ liệu sản phẩm; web search dùng kết quả Tavily mẫu.
+
+    python -m benchmarks.tool_output_tokens
+"""
+import asyncio
+import sys
+from typing import Any, Dict
+from app.core.ai.tokens import count_tokens
+from app.core.ai.tool_output import (
+    serialize_rows,
+    serialize_web_results,
+    PRODUCT_SEARCH_TOOL_MAX_TOKENS,
+    WEB_SEARCH_TOOL_MAX_TOKENS,
+)
+from app.database.pool import open_pool, close_pool
+from app.database.product_service import aget_flexible_product_search
+
+PRODUCT_SHAPES: Dict[str, Dict[str, Any]] = {
+    "default_columns": {"name": ["iphone"]},
+    "few_columns": {"use_columns": ["name", "price", "address"], "name": ["samsung"], "limit": 5},
+    "all_rows": {"use_columns": ["name", "capacity", "color", "price", "specifications", "product_information"]},
+}
+
+# Tavily trả về tối đa 5 kết quả, nội dung mỗi kết quả thường vài nghìn ký tự
+WEB_RESPONSE = {
+    "answer": "Apple ra mắt iPhone 16 với chip A18 và nút Camera Control. " * 3,
+    "results": [
+        {
+            "title": f"Tin tức điện thoại {i}",
+            "url": f"https://example.com/news/{i}",
+            "content": "Đánh giá chi tiết hiệu năng, camera, pin và giá bán tại Việt Nam. " * 60,
+        }
+        for i in range(5)
+    ],
+}
+
+
+def _legacy_web_format(response: Dict[str, Any]) -> str:
+    # Định dạng cũ của format_web_search_response: nối toàn bộ nội dung
+    parts = [f"🔎 Tóm tắt: {response['answer']}"]
+    for idx, result in enumerate(response["results"], 1):
+        parts.append(f"{idx}. {result['title']}\nURL: {result['url']}\n{result['content']}")
+    return "\n\n".join(parts)
+
+
+def report(label: str, before: str, after: str, budget: int) -> bool:
+    before_tokens, after_tokens = count_tokens(before), count_tokens(after)
+    # Cho phép sai số nhỏ vì token được đếm theo từng dòng
+    ok = after_tokens <= budget * 1.02
+    print(
+        f"{label:<18}{before_tokens:>10}{after_tokens:>10}{budget:>10}"
+        f"{(1 - after_tokens / before_tokens) * 100 if before_tokens else 0:>9.0f}%  {'ok' if ok else 'OVER BUDGET'}"
+    )
+    return ok
+
+
+async def main() -> int:
+    await open_pool()
+    failures = 0
+    try:
+        print(f"{'output':<18}{'repr':>10}{'compact':>10}{'budget':>10}{'saved':>10}")
+        for label, kwargs in PRODUCT_SHAPES.items():
+            rows = await aget_flexible_product_search(**kwargs)
+            failures += not report(label, str(rows), serialize_rows(rows), PRODUCT_SEARCH_TOOL_MAX_TOKENS)
+
+        failures += not report(
+            "web_search", _legacy_web_format(WEB_RESPONSE), serialize_web_results(WEB_RESPONSE), WEB_SEARCH_TOOL_MAX_TOKENS
+        )
+        print()
+        print(serialize_rows((await aget_flexible_product_search(**PRODUCT_SHAPES["few_columns"])))[:600])
+    finally:
+        await close_pool()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
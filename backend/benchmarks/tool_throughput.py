@@ -0,0 +1,114 @@
+"""
+So sánh thông lượng tool của agent khi chạy đồng thời:
+- sync: _run trong executor mặc định (cách LangChain chạy tool không có _arun)
+- async: _arun trên pool psycopg async / httpx
+
+Web search dùng Tavily giả với độ trễ cố định (không gọi mạng, không dùng cache),
+product search cần Postgres có dữ liệu sản phẩm (cache kết quả bị tắt khi đo).
+
+    python -m benchmarks.tool_throughput --calls 200 --search-latency 0.2
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List
+import httpx
+from app.core.ai import tools
+from app.core.ai.web_search import AsyncTavilyClient, CachedWebSearch, WebSearchCache
+from app.database.pool import open_pool, close_pool
+from app.database.product_search_cache import product_search_cache
+
+SEARCH_RESPONSE = {"answer": "stub", "results": [{"title": "stub", "url": "https://example.com", "content": "..."}]}
+
+
+class SleepingTavilyClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def search(self, query: str, **kwargs) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return SEARCH_RESPONSE
+
+
+def stub_async_client(latency: float) -> AsyncTavilyClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=SEARCH_RESPONSE)
+
+    return AsyncTavilyClient(
+        api_key="stub",
+        client=httpx.AsyncClient(base_url="http://tavily.stub", transport=httpx.MockTransport(handler)),
+    )
+
+
+async def timed(call: Callable[[], Awaitable[Any]], latencies: List[float]) -> None:
+    start = time.perf_counter()
+    await call()
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_mode(tool, args: List[Dict[str, Any]], use_async: bool) -> Dict[str, float]:
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+
+    def make_call(kwargs):
+        if use_async:
+            return lambda: tool._arun(**kwargs)
+        return lambda: loop.run_in_executor(None, partial(tool._run, **kwargs))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(make_call(kwargs), latencies) for kwargs in args))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "calls_per_s": len(args) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+async def main(calls: int, search_latency: float) -> int:
+    # Mỗi lời gọi là một truy vấn khác nhau trên cache rỗng để luôn đi tới upstream
+    tools.web_search = CachedWebSearch(
+        cache=WebSearchCache(":memory:"),
+        client_factory=lambda: SleepingTavilyClient(search_latency),
+        async_client_factory=lambda: stub_async_client(search_latency),
+    )
+    product_search_cache.max_entries = 0
+
+    web_args = [{"q": f"phone news {i}"} for i in range(calls)]
+    product_args = [{"name": ["iphone", "galaxy"][i % 2:i % 2 + 1], "limit": 10} for i in range(calls)]
+
+    await open_pool()
+    try:
+        print(f"{calls} concurrent calls per run\n")
+        print(f"{'tool':<26}{'mode':<8}{'calls/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for label, tool, args in (
+            ("search_web", tools.SearchWebTool(), web_args),
+            ("flexible_product_search", tools.FlexibleProductSearchTool(), product_args),
+        ):
+            for mode, use_async in (("sync", False), ("async", True)):
+                if label == "search_web":
+                    # Truy vấn mới cho mỗi lượt để không trúng kết quả của lượt trước
+                    args = [{"q": f"{kwargs['q']} {mode}"} for kwargs in args]
+                result = await run_mode(tool, args, use_async)
+                print(
+                    f"{label:<26}{mode:<8}{result['calls_per_s']:>10.1f}"
+                    f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                )
+    finally:
+        await tools.web_search.aclose()
+        await close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.calls, args.search_latency)))
@@ -0,0 +1,140 @@
+"""
+Kiểm tra cache tìm kiếm web với client Tavily giả (không gọi mạng, không cần API key):
+chuẩn hóa truy vấn, TTL, lưu bền qua file SQLite, gộp truy vấn đồng thời và không cache lỗi.
+
+    python -m benchmarks.web_search_cache
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.ai.web_search import CachedWebSearch, WebSearchCache
+
+
+class StubTavilyClient:
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, query: str, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream unavailable")
+        return {"answer": f"answer for {query}", "results": [{"title": query, "url": "https://example.com", "content": "..."}]}
+
+
+class StubAsyncTavilyClient:
+    def __init__(self, delay: float = 0.2, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def search(self, query: str, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream unavailable")
+        return {"answer": f"answer for {query}", "results": []}
+
+    async def aclose(self):
+        pass
+
+
+def check(name: str, ok: bool) -> int:
+    print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "web_search.sqlite3")
+
+        stub = StubTavilyClient()
+        search = CachedWebSearch(cache=WebSearchCache(path, ttl=60), client_factory=lambda: stub)
+        search.search("Latest iPhone")
+        search.search("  latest   IPHONE ")
+        failures += check("normalized query served from cache", stub.calls == 1 and search.hits == 1)
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(search.search, ["galaxy s24 review"] * 10))
+        failures += check(
+            "concurrent identical queries coalesced",
+            stub.calls == 2 and all(r == results[0] for r in results),
+        )
+        search.cache.close()
+
+        restarted_stub = StubTavilyClient()
+        restarted = CachedWebSearch(cache=WebSearchCache(path, ttl=60), client_factory=lambda: restarted_stub)
+        restarted.search("latest iphone")
+        failures += check("cache survives restart", restarted_stub.calls == 0)
+        restarted.cache.close()
+
+        expiring_stub = StubTavilyClient(delay=0)
+        expiring = CachedWebSearch(cache=WebSearchCache(path, ttl=0.1), client_factory=lambda: expiring_stub)
+        expiring.search("pixel 9")
+        time.sleep(0.2)
+        expiring.search("pixel 9")
+        failures += check("entries expire after ttl", expiring_stub.calls == 2)
+        expiring.cache.close()
+
+        failing_stub = StubTavilyClient(fail=True)
+        failing = CachedWebSearch(cache=WebSearchCache(path, ttl=60), client_factory=lambda: failing_stub)
+        errors = 0
+        for _ in range(2):
+            try:
+                failing.search("xiaomi 15")
+            except RuntimeError:
+                errors += 1
+        failures += check("errors are not cached", errors == 2 and failing_stub.calls == 2)
+        failing.cache.close()
+
+        failures += asyncio.run(check_async(path))
+
+    return 1 if failures else 0
+
+
+async def check_async(path: str) -> int:
+    failures = 0
+
+    stub = StubAsyncTavilyClient()
+    search = CachedWebSearch(cache=WebSearchCache(path, ttl=60), async_client_factory=lambda: stub)
+    # Request đầu (leader) hết thời gian chờ; các request gộp vào vẫn phải nhận kết quả
+    leader = asyncio.create_task(asyncio.wait_for(search.asearch("oppo find x8"), timeout=0.05))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(search.asearch("OPPO  find x8")) for _ in range(5)]
+    leader_timed_out = False
+    try:
+        await leader
+    except asyncio.TimeoutError:
+        leader_timed_out = True
+    results = await asyncio.gather(*followers, return_exceptions=True)
+    failures += check(
+        "async followers survive a cancelled leader",
+        leader_timed_out and stub.calls == 1 and all(isinstance(r, dict) for r in results),
+    )
+    cached = await search.asearch("oppo find x8")
+    failures += check("async result cached", stub.calls == 1 and cached == results[0])
+    search.cache.close()
+
+    failing_stub = StubAsyncTavilyClient(fail=True)
+    failing = CachedWebSearch(cache=WebSearchCache(path, ttl=60), async_client_factory=lambda: failing_stub)
+    results = await asyncio.gather(*(failing.asearch("vivo x200") for _ in range(3)), return_exceptions=True)
+    failures += check(
+        "async errors reach every waiter as exceptions",
+        failing_stub.calls == 1 and all(isinstance(r, RuntimeError) for r in results),
+    )
+    failing.cache.close()
+
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import router as chat_router
+from app.api.metrics import router as metrics_router
+from app.database.pool import open_pool, close_pool
+from app.database.history_writer import history_writer
+from app.database.migrations import run_migrations
+from app.database.catalog_engine import catalog_engine
+from app.core.ai.service import warm_agent_cache
+from app.core.ai.web_search import web_search
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI()
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_AUTO_MIGRATE:
+        await asyncio.to_thread(run_migrations)
+    await open_pool()
+    await history_writer.start()
+    await catalog_engine.start()
+    warm_agent_cache()
+    try:
+        yield
+    finally:
+        # Ghi hết lịch sử chat còn trong hàng đợi trước khi đóng pool
+        await history_writer.stop()
+        await catalog_engine.stop()
+        await web_search.aclose()
+        await close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 print("CORS_ORIGIN:", os.getenv("CORS_ORIGIN"))
 
@@ -18,6 +46,8 @@ app.add_middleware(
 )
 
 app.include_router(chat_router, prefix="/api") # tags=["chat"]
+# Prometheus scrape endpoint ở gốc (/metrics), ngoài prefix /api
+app.include_router(metrics_router, tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
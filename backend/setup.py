@@ -11,6 +11,7 @@ setup(
         "langchain",
         "langchain-openai",
         "psycopg",
+        "psycopg-pool",
         "pydantic"
     ],
     entry_points={
@@ -39,6 +39,36 @@ export const chatService = {
         }
     },
 
+    /**
+        * Lấy lịch sử chat của một phiên, mới nhất trước, phân trang theo cursor
+        *
+        * @param {string} sessionId - ID phiên chat
+        * @param {string|null} cursor - Cursor của trang trước (next_cursor), null cho trang đầu
+        * @param {number} limit - Số lượt chat tối đa mỗi trang
+        * @returns {Promise<{items: Array, next_cursor: string|null}>} Một trang lịch sử
+    */
+    getChatHistory: async (sessionId, cursor = null, limit = 20) => {
+        try {
+            const params = new URLSearchParams({ limit: String(limit) });
+            if (cursor) {
+                params.append('cursor', cursor);
+            }
+
+            const response = await fetch(
+                `${API_URL}/api/chat/history/${encodeURIComponent(sessionId)}?${params.toString()}`
+            );
+
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+
+            return await response.json();
+        } catch (error) {
+            console.error('Error loading chat history:', error);
+            throw error;
+        }
+    },
+
     /**
          * Gửi tin nhắn đến server và nhận phản hồi dạng stream
          *